@@ -0,0 +1,147 @@
+from collections import namedtuple
+
+import numpy as np
+
+from doa_algorithm import C, carrier_spectra, tdoa_to_doa
+
+
+AdaptiveResult = namedtuple(
+    "AdaptiveResult",
+    [
+        "theta_est",   # DOA (deg)
+        "delta_t",     # TDOA (s)
+        "std_deg",     # standard error of theta_est (deg)
+        "coherence",   # mean resultant length of the block phases, 0..1
+        "n_samples",   # samples used per sensor
+        "t_used",      # observation time used (s)
+        "converged",   # std_deg reached the target
+    ],
+)
+
+
+def _block_phasors(x1, x2, Fs, f, block, n_bins):
+    # Mean carrier-bin cross-phasor of every complete block, (..., n_blocks).
+    nb = x1.shape[-1] // block
+    shape = x1.shape[:-1] + (nb, block)
+    x = np.stack([x1[..., :nb * block].reshape(shape),
+                  x2[..., :nb * block].reshape(shape)])
+    S, _ = carrier_spectra(x, Fs, f, n_bins)
+    return np.mean(S[0] * np.conj(S[1]), axis=-1)
+
+
+def _statistics(z_sum, u_sum, n, f, d):
+    # Estimate and its standard error from the running sums of n block
+    # cross-phasors (z) and their unit phasors (u).
+    phi = np.angle(z_sum)
+    delta_t = phi / (2 * np.pi * f)
+    theta = tdoa_to_doa(delta_t, d)
+
+    # Small-sample corrected squared mean resultant length, then the
+    # circular standard deviation sqrt(-ln R^2) over sqrt(n).
+    R = np.abs(u_sum) / n
+    R2 = np.clip((n * R ** 2 - 1) / np.maximum(n - 1, 1), 1e-12, 1.0)
+    std_phi = np.sqrt(-np.log(R2) / n)
+
+    # d(theta)/d(phi) of theta = arcsin(C * phi / (2 pi f d))
+    cos_theta = np.maximum(np.cos(np.deg2rad(theta)), 1e-3)
+    std_deg = np.rad2deg(std_phi * C / (2 * np.pi * f * d * cos_theta))
+    return theta, delta_t, std_deg, R
+
+
+def estimate_doa_adaptive(x1, x2, Fs, f, d, target_deg=0.1, block=2048, n_bins=5,
+                          min_blocks=4):
+    """
+    Phase DOA that stops reading the capture once it is confident enough.
+
+    The carrier-bin cross-phasor of each block of samples is accumulated;
+    after every block the spread of the block phases gives the standard
+    error of the running estimate, and processing stops at the first
+    block (at least min_blocks) where it is at most target_deg. Whatever
+    is left of x1 / x2 is never used. Inputs may be batched (..., N); each
+    row stops on its own.
+
+    Phase is converted to delay with the carrier f itself, since bins of a
+    short block are coarse. Returns an AdaptiveResult; with converged
+    False all of the capture was used.
+    """
+    x1 = np.asarray(x1)
+    x2 = np.asarray(x2)
+    z = _block_phasors(x1, x2, Fs, f, block, n_bins)
+    if z.shape[-1] == 0:
+        raise ValueError("capture is shorter than one block")
+
+    z_sum = np.cumsum(z, axis=-1)
+    u_sum = np.cumsum(z / np.maximum(np.abs(z), np.finfo(float).tiny), axis=-1)
+    n = np.arange(1, z.shape[-1] + 1)
+    theta, delta_t, std_deg, R = _statistics(z_sum, u_sum, n, f, d)
+
+    done = (std_deg <= target_deg) & (n >= min_blocks)
+    converged = done.any(axis=-1)
+    stop = np.where(converged, np.argmax(done, axis=-1), z.shape[-1] - 1)
+
+    def pick(a):
+        return np.take_along_axis(a, stop[..., None], axis=-1)[..., 0]
+
+    n_samples = (stop + 1) * block
+    result = AdaptiveResult(pick(theta), pick(delta_t), pick(std_deg), pick(R),
+                            n_samples, n_samples / Fs, converged)
+    if z.ndim == 1:
+        result = AdaptiveResult(*(np.asarray(v).item() for v in result))
+    return result
+
+
+class AdaptiveDOAEstimator:
+    """
+    Streaming form of estimate_doa_adaptive for two-sensor blocks of any
+    size. push() returns None until the target confidence is reached,
+    then the AdaptiveResult; reset() starts a new measurement.
+    """
+
+    def __init__(self, Fs, f, d, target_deg=0.1, block=2048, n_bins=5, min_blocks=4,
+                 max_samples=None):
+        self.Fs = Fs
+        self.f = f
+        self.d = d
+        self.target_deg = target_deg
+        self.block = block
+        self.n_bins = n_bins
+        self.min_blocks = min_blocks
+        self.max_samples = max_samples
+        self.reset()
+
+    def reset(self):
+        self._pending = np.zeros((2, 0))
+        self._z_sum = 0j
+        self._u_sum = 0j
+        self._n = 0
+
+    def result(self, converged=False):
+        theta, delta_t, std_deg, R = _statistics(
+            self._z_sum, self._u_sum, max(self._n, 1), self.f, self.d
+        )
+        n_samples = self._n * self.block
+        return AdaptiveResult(float(theta), float(delta_t), float(std_deg), float(R),
+                              n_samples, n_samples / self.Fs, converged)
+
+    def push(self, block):
+        """
+        Feed a (2, n) block. Returns the AdaptiveResult once converged (or
+        max_samples is reached, with converged False), else None.
+        """
+        x = np.concatenate([self._pending, np.asarray(block, dtype=float)], axis=1)
+        nb = x.shape[1] // self.block
+        z = _block_phasors(x[0], x[1], self.Fs, self.f, self.block, self.n_bins)
+        self._pending = x[:, nb * self.block:]
+
+        for zb in z:
+            self._z_sum += zb
+            self._u_sum += zb / max(abs(zb), np.finfo(float).tiny)
+            self._n += 1
+            if self._n >= self.min_blocks:
+                res = self.result(converged=True)
+                if res.std_deg <= self.target_deg:
+                    return res
+            if self.max_samples is not None and self._n * self.block >= self.max_samples:
+                return self.result()
+
+        return None
@@ -2,10 +2,8 @@
 
 import streamlit as st
 
-from sections.aim import render_aim
-from sections.theory import render_theory
-from sections.procedure import render_procedure
-from sections.simulation import render_simulation
+# Sections are imported when their page is shown, so the text pages never
+# load the simulation stack (see benchmarks/startup_budget.py).
 
 
 st.markdown(
@@ -73,15 +71,19 @@ content = st.empty()
 
 with content.container():
     if section == "Aim":
+        from sections.aim import render_aim
         render_aim()
 
     elif section == "Theory":
+        from sections.theory import render_theory
         render_theory()
 
     elif section == "Procedure":
+        from sections.procedure import render_procedure
         render_procedure()
 
     elif section == "Simulation":
+        from sections.simulation import render_simulation
         render_simulation()
 
 
@@ -0,0 +1,183 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from pipeline import DOAPipeline
+from profiling import profile_stages, stage
+
+
+@lru_cache(maxsize=8)
+def _get_pipeline(Fs, T, f, d, decim=None):
+    # One pipeline per configuration per worker process.
+    return DOAPipeline(Fs, T, f, d, decim=decim)
+
+
+def parse_values(spec):
+    """
+    Parse "a,b,c" or an inclusive range "start:stop:step" into floats.
+    """
+    values = []
+    for part in spec.split(","):
+        part = part.strip()
+        if ":" in part:
+            start, stop, step = (float(v) for v in part.split(":"))
+            n = int(np.floor((stop - start) / step + 1e-9)) + 1
+            values.extend(start + step * np.arange(n))
+        elif part:
+            values.append(float(part))
+    return [float(v) for v in values]
+
+
+def cell_seed(root, theta, noise_sigma, repeat):
+    """
+    SeedSequence of one (theta, noise sigma, repeat) cell under the root
+    entropy, from the exact bit patterns of the two floats.
+    """
+    bits = np.array([theta, noise_sigma], dtype=np.float64) + 0.0   # -0.0 -> 0.0
+    return np.random.SeedSequence([root, *bits.view(np.uint64).tolist(), repeat])
+
+
+def grid_jobs(angles, noise_sigmas, repeats, Fs, T, f, d, seed=None, cache_dir=None,
+              decim=None):
+    """
+    One job per (angle, noise sigma, repeat). Every job gets its own
+    SeedSequence derived from (seed, theta, sigma, repeat) by cell_seed, so
+    results do not depend on how jobs are spread over workers or on the
+    rest of the grid: a cell gets the same noise in any sweep with the
+    same seed.
+
+    With cache_dir, estimates are looked up in / stored to the result
+    cache there, so rerunning an overlapping sweep with the same seed only
+    computes the new cells.
+
+    decim selects the complex baseband front end of DOAPipeline.
+    """
+    root = np.random.SeedSequence(seed).entropy
+
+    jobs = []
+    for theta in angles:
+        for sigma in noise_sigmas:
+            for r in range(repeats):
+                jobs.append({
+                    "seed": cell_seed(root, theta, sigma, r),
+                    "theta": theta,
+                    "noise_sigma": sigma,
+                    "repeat": r,
+                    "Fs": Fs, "T": T, "f": f, "d": d, "decim": decim,
+                    "cache_dir": cache_dir,
+                })
+    return jobs
+
+
+def run_grid_job(job):
+    """
+    One synthetic run; returns a list with a single result row.
+    """
+    pipeline = _get_pipeline(job["Fs"], job["T"], job["f"], job["d"], job.get("decim"))
+    if job.get("cache_dir"):
+        from result_cache import default_cache, run_cached
+
+        result = run_cached(pipeline, job["theta"], job["noise_sigma"], job["seed"],
+                            default_cache(job["cache_dir"]), full=False)
+    else:
+        result = pipeline.run(job["theta"], job["noise_sigma"], rng=job["seed"])
+
+    theta_est = float(result.theta_est)
+    return [{
+        "theta": job["theta"],
+        "noise_sigma": job["noise_sigma"],
+        "repeat": job["repeat"],
+        "theta_est": theta_est,
+        "error": theta_est - job["theta"],
+    }]
+
+
+def file_jobs(paths, Fs, f, d, window, hop, raw_channels, raw_dtype, decim=None):
+    return [{
+        "path": path,
+        "Fs": Fs, "f": f, "d": d, "decim": decim,
+        "window": window, "hop": hop,
+        "raw_channels": raw_channels, "raw_dtype": raw_dtype,
+    } for path in paths]
+
+
+def run_file_job(job):
+    """
+    Per-window DOA series of one recording; returns one row per window.
+    WAV files carry their own sample rate; other files are read as raw
+    interleaved binaries with the job's Fs.
+    """
+    from recordings import doa_time_series, open_raw, open_wav
+
+    path = job["path"]
+    if path.lower().endswith(".wav"):
+        Fs, data = open_wav(path)
+    else:
+        Fs = job["Fs"]
+        data = open_raw(path, job["raw_channels"], job["raw_dtype"])
+
+    with stage("doa_time_series"):
+        series = doa_time_series(data, Fs, job["f"], job["d"], job["window"], job["hop"],
+                                 decim=job.get("decim"))
+
+    return [
+        {"file": path, "time": float(t), "theta_est": float(th)}
+        for t, th in zip(series["time"], series["theta"])
+    ]
+
+
+def _run_profiled(fn_job):
+    # Profile one job inside its worker; stage records travel back with rows.
+    fn, job = fn_job
+    with profile_stages() as prof:
+        rows = fn(job)
+    return rows, prof.records
+
+
+def _run_plain(fn_job):
+    fn, job = fn_job
+    return fn(job), []
+
+
+def run_jobs(fn, jobs, workers=None, chunksize=1, profile=False):
+    """
+    Map fn over jobs on a process pool (inline when workers == 1).
+
+    Returns (rows, records): the concatenated result rows in job order and,
+    with profile=True, the stage records of every job.
+    """
+    runner = _run_profiled if profile else _run_plain
+    tasks = [(fn, job) for job in jobs]
+
+    if workers == 1:
+        results = list(map(runner, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(runner, tasks, chunksize=chunksize))
+
+    rows = [row for job_rows, _ in results for row in job_rows]
+    records = [rec for _, job_records in results for rec in job_records]
+    return rows, records
+
+
+def write_results(rows, path):
+    """
+    Write result rows to path: JSON for .json, JSON lines for .jsonl,
+    CSV otherwise.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "w", newline="") as fh:
+        if ext == ".json":
+            json.dump(rows, fh, indent=1)
+        elif ext == ".jsonl":
+            for row in rows:
+                fh.write(json.dumps(row) + "\n")
+        else:
+            fields = list(rows[0]) if rows else []
+            writer = csv.DictWriter(fh, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
@@ -0,0 +1,130 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy.signal import find_peaks
+
+from doa_algorithm import C, carrier_spectra
+
+
+@lru_cache(maxsize=32)
+def _angle_grid(start, stop, step):
+    n = int(round((stop - start) / step)) + 1
+    grid = start + step * np.arange(n)
+    grid.setflags(write=False)
+    return grid
+
+
+def angle_grid(start=-90.0, stop=90.0, step=0.1):
+    """
+    Inclusive scan grid of angles (deg).
+    """
+    return _angle_grid(float(start), float(stop), float(step))
+
+
+@lru_cache(maxsize=32)
+def _steering_matrix(positions, f, start, stop, step):
+    theta = np.deg2rad(_angle_grid(start, stop, step))
+    p = np.asarray(positions)[:, None]
+    A = np.exp(-2j * np.pi * f * p * np.sin(theta)[None, :] / C)
+    A.setflags(write=False)
+    return A
+
+
+def steering_matrix(positions, f, start=-90.0, stop=90.0, step=0.1):
+    """
+    (M, G) far-field steering matrix of a linear array at frequency f over
+    angle_grid(start, stop, step). Cached per (geometry, frequency, grid);
+    the returned array is read-only.
+    """
+    positions = tuple(float(p) for p in np.ravel(positions))
+    return _steering_matrix(positions, float(f), float(start), float(stop), float(step))
+
+
+def spatial_covariance(X, Fs, f, n_bins=5, method="auto"):
+    """
+    (..., M, M) covariance of the carrier-bin snapshots of an (..., M, N)
+    array, i.e. the same bins estimate_tdoa_phase uses.
+
+    The bins of one frame are not independent snapshots: emitters at the
+    same carrier (as from generate_multi_source_signals) are coherent and
+    R is rank one, so see smoothed_covariance before separating them.
+    """
+    S, _ = carrier_spectra(X, Fs, f, n_bins, method)
+    return S @ np.conj(np.swapaxes(S, -1, -2)) / S.shape[-1]
+
+
+def smoothed_covariance(R, subarray):
+    """
+    Forward-backward spatially smoothed (..., L, L) covariance of a
+    uniform linear array: the mean of R's L x L diagonal blocks (the
+    M - L + 1 subarrays shifted by one element) and of their conjugate
+    reversals. This restores the rank lost to coherent sources; up to
+    2 * (M - L + 1) of them, and fewer than L, can be separated.
+    """
+    M = R.shape[-1]
+    L = int(subarray)
+    if not 2 <= L <= M:
+        raise ValueError(f"subarray must be between 2 and {M}, got {subarray!r}")
+    Rs = sum(R[..., i:i + L, i:i + L] for i in range(M - L + 1)) / (M - L + 1)
+    return 0.5 * (Rs + np.conj(Rs[..., ::-1, ::-1]))
+
+
+def spatial_spectrum(X, positions, Fs, f, start=-90.0, stop=90.0, step=0.1,
+                     beamformer="das", n_bins=5, loading=1e-3, subarray=None):
+    """
+    Narrowband spatial spectrum of an (..., M, N) array over an angle grid.
+
+    beamformer="das":  delay-and-sum power  a^H R a / M^2
+    beamformer="mvdr": Capon power  1 / (a^H R^-1 a), with diagonal loading
+                       of loading * trace(R) / M
+
+    Without subarray, several sources at the same carrier are coherent:
+    both beamformers then see one merged wavefront and their peaks are
+    biased. For a uniform linear array, subarray=L scans the smoothed
+    covariance (see smoothed_covariance) with an L-element aperture,
+    which separates them (e.g. L = 2 * M // 3 for two sources) with
+    MVDR; DAS peaks of closely spaced sources stay biased by its beamwidth.
+
+    All grid angles are evaluated in one product against the cached
+    steering matrix. Returns (angles, P) with P of shape (..., G).
+    """
+    positions = np.ravel(np.asarray(positions, dtype=float))
+    R = spatial_covariance(X, Fs, f, n_bins)
+    if subarray is not None:
+        spacing = np.diff(positions)
+        if not np.allclose(spacing, spacing[0]):
+            raise ValueError("subarray smoothing needs uniformly spaced positions")
+        R = smoothed_covariance(R, subarray)
+        positions = positions[:int(subarray)]
+
+    A = steering_matrix(positions, f, start, stop, step)
+    M = A.shape[0]
+
+    if beamformer == "das":
+        W = R
+    elif beamformer == "mvdr":
+        trace = np.real(np.trace(R, axis1=-2, axis2=-1))[..., None, None]
+        W = np.linalg.inv(R + loading * trace / M * np.eye(M))
+    else:
+        raise ValueError(f"Unknown beamformer: {beamformer!r}")
+
+    quad = np.real(np.sum(np.conj(A) * (W @ A), axis=-2))
+
+    if beamformer == "das":
+        P = quad / M ** 2
+    else:
+        P = 1.0 / np.maximum(quad, np.finfo(float).tiny)
+
+    return angle_grid(start, stop, step), P
+
+
+def find_doa_peaks(angles, P, n_sources=1):
+    """
+    Angles (deg) of the n_sources strongest local maxima of a spatial
+    spectrum, strongest first.
+    """
+    peaks, _ = find_peaks(P)
+    if len(peaks) == 0:
+        peaks = np.array([np.argmax(P)])
+    order = np.argsort(P[peaks])[::-1][:n_sources]
+    return angles[peaks[order]]
@@ -0,0 +1,177 @@
+"""
+Timing and memory benchmarks for the synthesis / filtering / estimation
+hot paths.
+
+    python benchmarks/bench_hotpaths.py                     # run, append to history
+    python benchmarks/bench_hotpaths.py --save-baseline     # ... and make it the baseline
+    python benchmarks/bench_hotpaths.py --durations 0.001,0.1,1
+
+Every run is appended as one JSON line to benchmarks/history.jsonl. If
+benchmarks/baseline.json exists, each case is compared against it and the
+script exits with status 1 when any case is slower (or allocates more)
+than the baseline by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from signal_model import generate_time_axis, generate_signals  # noqa: E402
+from doa_algorithm import bandpass_filter, estimate_tdoa_phase, tdoa_to_doa  # noqa: E402
+
+HISTORY = os.path.join(HERE, "history.jsonl")
+BASELINE = os.path.join(HERE, "baseline.json")
+
+FS = 100_000
+F = 30_000
+D = 0.02
+
+
+def measure(fn, min_time=0.2, max_repeats=50):
+    """
+    Best-of-n wall time (s) and tracemalloc peak (bytes) of fn().
+    """
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = float("inf")
+    total = 0.0
+    repeats = 0
+    while repeats < max_repeats and (repeats == 0 or total < min_time):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = min(best, dt)
+        total += dt
+        repeats += 1
+
+    return best, peak
+
+
+def cases(durations, n_bins_list):
+    """
+    Yield (name, params, fn) for every benchmark case.
+    """
+    for T in durations:
+        t = generate_time_axis(FS, T)
+        x1, x2, _ = generate_signals(t, F, 20, D, 0.05, rng=0)
+        x = np.stack([x1, x2])
+        xf = bandpass_filter(x, FS, F)
+        delta_t = np.full(len(t), 5e-6)
+
+        p = {"duration": T, "samples": len(t)}
+        yield "generate_time_axis", p, lambda T=T: generate_time_axis(FS, T)
+        yield "generate_signals", p, lambda t=t: generate_signals(t, F, 20, D, 0.05, rng=0)
+        yield "bandpass_filter", p, lambda x=x: bandpass_filter(x, FS, F)
+        for n_bins in n_bins_list:
+            yield ("estimate_tdoa_phase", dict(p, n_bins=n_bins),
+                   lambda xf=xf, n_bins=n_bins: estimate_tdoa_phase(xf[0], xf[1], FS, F, n_bins))
+        yield "tdoa_to_doa", p, lambda delta_t=delta_t: tdoa_to_doa(delta_t, D)
+
+
+def case_key(name, params):
+    extra = ",".join(f"{k}={params[k]}" for k in sorted(params) if k != "samples")
+    return f"{name}[{extra}]"
+
+
+def git_revision():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE, capture_output=True, text=True, check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Return a list of regression messages for results vs baseline.
+    """
+    base = {r["key"]: r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get(r["key"])
+        if b is None:
+            continue
+        for field in ("seconds", "peak_bytes"):
+            if b[field] > 0 and r[field] > b[field] * (1 + threshold):
+                regressions.append(
+                    f"{r['key']}: {field} {b[field]:.4g} -> {r[field]:.4g} "
+                    f"(+{100 * (r[field] / b[field] - 1):.0f}%)"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--durations", default="0.001,0.01,0.1,1,10,60",
+                        help="signal lengths in seconds at Fs = 100 kHz")
+    parser.add_argument("--n-bins", default="1,5,21,101")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown / growth vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--no-history", action="store_true")
+    args = parser.parse_args(argv)
+
+    durations = [float(v) for v in args.durations.split(",")]
+    n_bins_list = [int(v) for v in args.n_bins.split(",")]
+
+    results = []
+    for name, params, fn in cases(durations, n_bins_list):
+        seconds, peak = measure(fn)
+        key = case_key(name, params)
+        results.append({"key": key, "name": name, **params,
+                        "seconds": seconds, "peak_bytes": peak})
+        print(f"{key:55s} {seconds * 1e3:10.3f} ms {peak / 2**20:10.2f} MiB")
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    if not args.no_history:
+        with open(HISTORY, "a") as fh:
+            fh.write(json.dumps(record) + "\n")
+
+    status = 0
+    if os.path.exists(BASELINE) and not args.save_baseline:
+        with open(BASELINE) as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs baseline {baseline.get('git')}:")
+            for msg in regressions:
+                print("  " + msg)
+            status = 1
+        else:
+            print(f"\nNo regressions vs baseline {baseline.get('git')}.")
+
+    if args.save_baseline:
+        with open(BASELINE, "w") as fh:
+            json.dump(record, fh, indent=1)
+        print(f"\nBaseline saved to {BASELINE}")
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
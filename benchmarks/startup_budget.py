@@ -0,0 +1,143 @@
+"""
+Cold-start report and import budget for the Streamlit app.
+
+    python benchmarks/startup_budget.py                  # report, check budget
+    python benchmarks/startup_budget.py --budget 0.5 --repeats 5
+
+Each repeat starts a fresh interpreter, loads app.py through Streamlit's
+AppTest on the landing page, then opens the other pages in turn and
+finally clicks Run Simulation, timing each step and noting which heavy
+modules are loaded by then. A -X importtime run of the landing page lists
+the slowest imports.
+
+Exits with status 1 when the median landing-page cold start (imports
+included) exceeds --budget seconds, or when any of HEAVY_MODULES is
+imported before the Simulation page is opened.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# Must not be imported by the Aim / Theory / Procedure pages.
+HEAVY_MODULES = ["matplotlib", "scipy.signal", "scipy.fft", "doa_algorithm", "pipeline"]
+
+_PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t_streamlit = time.perf_counter() - t0
+
+heavy = {heavy!r}
+out = {{"streamlit_import_s": t_streamlit, "pages": []}}
+
+def step(name, fn):
+    t0 = time.perf_counter()
+    fn()
+    if at.exception:
+        raise SystemExit(f"{{name}}: {{at.exception[0].value}}")
+    out["pages"].append({{
+        "step": name,
+        "seconds": time.perf_counter() - t0,
+        "heavy_loaded": [m for m in heavy if m in sys.modules],
+    }})
+
+at = AppTest.from_file({app!r}, default_timeout=120)
+step("Aim (cold start)", at.run)
+for page in ["Theory", "Procedure", "Simulation"]:
+    step(page, lambda: at.sidebar.radio[0].set_value(page).run())
+step("Run Simulation", lambda: at.button[-1].click().run())
+print(json.dumps(out))
+"""
+
+_IMPORTTIME = r"""
+from streamlit.testing.v1 import AppTest
+AppTest.from_file({app!r}, default_timeout=120).run()
+"""
+
+
+def probe():
+    code = _PROBE.format(heavy=HEAVY_MODULES, app=os.path.join(ROOT, "app.py"))
+    # Empty result cache, so Run Simulation really computes.
+    with tempfile.TemporaryDirectory() as cache:
+        env = dict(os.environ, DOA_CACHE_DIR=cache)
+        proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                              capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(n=10):
+    """
+    (cumulative seconds, module) of the n slowest top-level imports of a
+    landing-page cold start.
+    """
+    code = _IMPORTTIME.format(app=os.path.join(ROOT, "app.py"))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        # Nested imports are indented and already counted in their parent.
+        if not name[1:].startswith(" ") and name.strip() != "site":
+            rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget", type=float, default=1.0,
+                        help="max median landing-page cold start (s)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", metavar="PATH", help="also write the raw results to PATH")
+    args = parser.parse_args(argv)
+
+    runs = [probe() for _ in range(args.repeats)]
+    steps = [p["step"] for p in runs[0]["pages"]]
+    median = {
+        name: float(np.median([r["pages"][i]["seconds"] for r in runs]))
+        for i, name in enumerate(steps)
+    }
+    streamlit_s = float(np.median([r["streamlit_import_s"] for r in runs]))
+
+    print(f"{'step':<20} {'median (s)':>10}  heavy modules loaded")
+    print(f"{'import streamlit':<20} {streamlit_s:>10.3f}")
+    for i, name in enumerate(steps):
+        heavy = ", ".join(runs[0]["pages"][i]["heavy_loaded"]) or "-"
+        print(f"{name:<20} {median[name]:>10.3f}  {heavy}")
+
+    print("\nslowest imports on the landing page (cumulative s):")
+    for seconds, name in slowest_imports():
+        print(f"  {seconds:7.3f}  {name}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"budget_s": args.budget, "median_s": median,
+                       "streamlit_import_s": streamlit_s, "runs": runs}, fh, indent=1)
+
+    failed = False
+    cold = median[steps[0]]
+    if cold > args.budget:
+        print(f"\nFAIL: cold start {cold:.3f} s exceeds budget {args.budget:.3f} s")
+        failed = True
+    for page in runs[0]["pages"]:
+        if page["step"] == "Simulation":
+            break
+        if page["heavy_loaded"]:
+            print(f"\nFAIL: {page['step']} loaded {', '.join(page['heavy_loaded'])}")
+            failed = True
+    if not failed:
+        print(f"\nOK: cold start {cold:.3f} s within budget {args.budget:.3f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
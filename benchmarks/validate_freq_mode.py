@@ -0,0 +1,68 @@
+"""
+Statistical check of the frequency-domain Monte Carlo mode against the
+full time-domain path.
+
+    python benchmarks/validate_freq_mode.py [--trials 1000] [--T 0.2]
+
+For every (angle, noise sigma) cell both modes are run with independent
+seeds. The RMSE must agree within --tol standard errors (relative SE of
+an RMSE from n trials is about 1/sqrt(2n)), and the biases must agree
+within --tol standard errors of their difference. Exits with status 1 on
+any mismatch.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monte_carlo import run_monte_carlo  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--angles", default="-60,-20,0,30,60")
+    parser.add_argument("--noise", default="0.02,0.1,0.3")
+    parser.add_argument("--trials", type=int, default=1000)
+    parser.add_argument("--T", type=float, default=0.2)
+    parser.add_argument("--tol", type=float, default=4.0)
+    args = parser.parse_args(argv)
+
+    angles = [float(v) for v in args.angles.split(",")]
+    sigmas = [float(v) for v in args.noise.split(",")]
+    n = args.trials
+
+    t0 = time.perf_counter()
+    ref = run_monte_carlo(angles, sigmas, n, T=args.T, seed=1, mode="time")
+    t1 = time.perf_counter()
+    fast = run_monte_carlo(angles, sigmas, n, T=args.T, seed=2, mode="freq")
+    t2 = time.perf_counter()
+
+    print(f"time-domain: {t1 - t0:.2f} s   frequency-domain: {t2 - t1:.3f} s\n")
+    print(f"{'angle':>7} {'sigma':>6} {'rmse time':>10} {'rmse freq':>10} "
+          f"{'bias time':>10} {'bias freq':>10}  status")
+
+    failures = 0
+    for i, theta in enumerate(angles):
+        for j, sigma in enumerate(sigmas):
+            r_t, r_f = ref["rmse"][i, j], fast["rmse"][i, j]
+            b_t, b_f = ref["bias"][i, j], fast["bias"][i, j]
+
+            rmse_ok = abs(r_f - r_t) <= args.tol * r_t / np.sqrt(2 * n)
+            se_bias = np.sqrt((ref["variance"][i, j] + fast["variance"][i, j]) / n)
+            bias_ok = abs(b_f - b_t) <= args.tol * se_bias
+
+            ok = rmse_ok and bias_ok
+            failures += not ok
+            print(f"{theta:7.1f} {sigma:6.3f} {r_t:10.5f} {r_f:10.5f} "
+                  f"{b_t:10.5f} {b_f:10.5f}  {'ok' if ok else 'MISMATCH'}")
+
+    print(f"\n{failures} mismatching cell(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
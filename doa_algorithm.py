@@ -1,43 +1,538 @@
+from functools import lru_cache
+
 import numpy as np
-from scipy.signal import butter, filtfilt
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import next_fast_len
+from scipy.signal import butter, firwin, kaiserord, sosfilt, sosfiltfilt, upfirdn
 
 C = 1500
 
 
-def bandpass_filter(x, Fs, f_center, bw=2000):
-    b, a = butter(
-        4,
+def real_dtype(x):
+    """
+    Working precision for x: float32 for float32/complex64 input,
+    float64 otherwise.
+    """
+    if np.asarray(x).dtype in (np.float32, np.complex64):
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+@lru_cache(maxsize=64)
+def butter_bandpass_sos(Fs, f_center, bw=2000, order=4):
+    """
+    Cached Butterworth band-pass design in second-order sections.
+    """
+    return butter(
+        order,
         [f_center - bw / 2, f_center + bw / 2],
         btype="band",
         fs=Fs,
+        output="sos",
+    )
+
+
+def bandpass_filter(x, Fs, f_center, bw=2000, order=4, axis=-1):
+    """
+    Zero-phase band-pass filter along axis. A 2-D (channels, samples)
+    array is filtered in a single call. float32 input stays float32.
+    """
+    sos = butter_bandpass_sos(Fs, f_center, bw, order)
+    return sosfiltfilt(sos.astype(real_dtype(x)), x, axis=axis)
+
+
+@lru_cache(maxsize=64)
+def fir_bandpass_taps(Fs, f_center, bw=2000, numtaps=257):
+    """
+    Cached linear-phase FIR band-pass design.
+    """
+    return firwin(
+        numtaps,
+        [f_center - bw / 2, f_center + bw / 2],
+        pass_zero=False,
+        fs=Fs,
     )
-    return filtfilt(b, a, x)
 
-def estimate_tdoa_phase(x1, x2, Fs, f, n_bins=5):
-    N = len(x1)
 
-    X1 = np.fft.fft(x1)
-    X2 = np.fft.fft(x2)
+class CausalBandpass:
+    """
+    Causal, stateful band-pass filter for chunked or unbounded input.
+
+    process() filters along the last axis and carries the filter state
+    between calls, so the output is identical whether the signal arrives
+    in one chunk or in many. Leading dimensions (e.g. channels) must stay
+    the same across calls.
+
+    method="iir": Butterworth SOS with sosfilt and carried zi.
+    method="fir": FIR (numtaps) applied by overlap-save FFT convolution
+                  with FFT size nfft; suited to long chunks.
+    """
+
+    def __init__(self, Fs, f_center, bw=2000, order=4, method="iir",
+                 numtaps=257, nfft=None):
+        if method not in ("iir", "fir"):
+            raise ValueError(f"Unknown method: {method!r}")
+
+        self.method = method
+
+        if method == "iir":
+            self.sos = butter_bandpass_sos(Fs, f_center, bw, order)
+        else:
+            self.taps = fir_bandpass_taps(Fs, f_center, bw, numtaps)
+            if nfft is None:
+                nfft = 1 << int(np.ceil(np.log2(8 * numtaps)))
+            if nfft < numtaps:
+                raise ValueError("nfft must be at least numtaps")
+            self.nfft = nfft
+            self.step = nfft - (numtaps - 1)
+            self._H = np.fft.rfft(self.taps, nfft)
+
+        self.reset()
+
+    def reset(self):
+        self._state = None
+
+    def process(self, x):
+        x = np.asarray(x)
+        if self.method == "iir":
+            return self._process_iir(x)
+        return self._process_fir(x)
+
+    def _process_iir(self, x):
+        if self._state is None:
+            self._state = np.zeros(
+                (self.sos.shape[0],) + x.shape[:-1] + (2,),
+                dtype=np.result_type(x, real_dtype(x)),
+            )
+        sos = self.sos.astype(real_dtype(x))
+        y, self._state = sosfilt(sos, x, axis=-1, zi=self._state)
+        return y
+
+    def _process_fir(self, x):
+        n_hist = len(self.taps) - 1
+        dtype = np.result_type(x, real_dtype(x))
+        if self._state is None:
+            self._state = np.zeros(x.shape[:-1] + (n_hist,), dtype=dtype)
+
+        n = x.shape[-1]
+        n_seg = -(-n // self.step)
+        total = (n_seg - 1) * self.step + self.nfft
+
+        z = np.zeros(x.shape[:-1] + (total,), dtype=dtype)
+        z[..., :n_hist] = self._state
+        z[..., n_hist:n_hist + n] = x
+        self._state = z[..., n:n + n_hist].copy()
+
+        if n == 0:
+            return z[..., :0]
+
+        segs = sliding_window_view(z, self.nfft, axis=-1)[..., ::self.step, :]
+        if np.iscomplexobj(z):
+            spec = np.fft.fft(segs, axis=-1) * np.fft.fft(self.taps, self.nfft)
+            y = np.fft.ifft(spec, axis=-1).astype(dtype)
+        else:
+            H = self._H.astype(np.result_type(dtype, np.complex64))
+            y = np.fft.irfft(np.fft.rfft(segs, axis=-1) * H, self.nfft, axis=-1)
+        y = y[..., n_hist:]
+
+        return y.reshape(x.shape[:-1] + (n_seg * self.step,))[..., :n]
+
+
+def carrier_bins(N, Fs, f, n_bins=5, f_lo=None):
+    """
+    Bin range [k_start, k_end) of n_bins bins centred on the positive-frequency
+    bin closest to f, and that bin's frequency.
 
-    freqs = np.fft.fftfreq(N, 1 / Fs)
-    pos = np.where(freqs > 0)[0]
-    k0 = pos[np.argmin(np.abs(freqs[pos] - f))]
+    With f_lo set, the signal is complex baseband mixed down by f_lo: the
+    centre bin is the one closest to f - f_lo, bin indices may be negative
+    (taken modulo N), and the returned frequency is referred back to RF.
+    """
+    if f_lo is not None:
+        kf = (f - f_lo) * N / Fs
+        k0 = int(np.floor(kf + 0.5))
+        k0 = min(max(k0, -((N - 1) // 2)), N // 2)
+
+        half = n_bins // 2
+        return k0 - half, k0 + half + 1, k0 * Fs / N + f_lo
+
+    kf = f * N / Fs
+    k0 = int(np.floor(kf))
+    if kf - k0 > 0.5:
+        k0 += 1
+    k0 = min(max(k0, 1), max((N - 1) // 2, 1))
 
     half = n_bins // 2
     k_start = max(k0 - half, 0)
     k_end   = min(k0 + half + 1, N)
 
-    phasors = X1[k_start:k_end] * np.conj(X2[k_start:k_end])
+    f_bin = k0 * Fs / N
+    return k_start, k_end, f_bin
+
+
+@lru_cache(maxsize=32)
+def _dft_rows(N, bins, B, dtype=np.float64):
+    # DFT rows for the given bins over one block of B samples, split into
+    # real/imag parts, plus the phase offset of every block start; all in
+    # the working precision dtype.
+    k = np.array(bins, dtype=np.int64)[:, None]
+    n = np.arange(B, dtype=np.int64)[None, :]
+    W = np.exp(-2j * np.pi * ((k * n) % N) / N)
+
+    starts = np.arange(N // B + 1, dtype=np.int64)[None, :] * B
+    P = np.exp(-2j * np.pi * ((k * starts) % N) / N).T
+
+    ctype = np.result_type(dtype, np.complex64)
+    return (
+        np.ascontiguousarray(W.real.T, dtype=dtype),
+        np.ascontiguousarray(W.imag.T, dtype=dtype),
+        P.astype(ctype),
+    )
+
+
+def partial_dft(x, k_start, k_end, block=4096):
+    """
+    DFT bins k_start..k_end-1 of x along the last axis, O(N * n_bins).
+    Works block-wise against cached DFT rows, so extra memory stays
+    O(block * n_bins) whatever the signal length.
+    """
+    return dft_bins(x, tuple(range(k_start, k_end)), block)
+
+
+def dft_bins(x, bins, block=4096):
+    """
+    DFT of x along the last axis at an arbitrary tuple of bins, in one
+    pass over x (see partial_dft).
+    """
+    x = np.asarray(x)
+    N = x.shape[-1]
+    B = min(block, N)
+    Wr, Wi, P = _dft_rows(N, tuple(bins), B, real_dtype(x))
+
+    nb, rem = divmod(N, B)
+    main = x[..., :nb * B].reshape(x.shape[:-1] + (nb, B))
+    Y = (main @ Wr) + 1j * (main @ Wi)
+    X = np.einsum("...bk,bk->...k", Y, P[:nb])
+
+    if rem:
+        tail = x[..., nb * B:]
+        X += ((tail @ Wr[:rem]) + 1j * (tail @ Wi[:rem])) * P[nb]
+
+    return X
+
+
+def _use_partial_dft(N, n_bins, method):
+    if method == "auto":
+        return n_bins < 2 * np.log2(max(N, 2))
+    if method not in ("fft", "dft"):
+        raise ValueError(f"Unknown method: {method!r}")
+    return method == "dft"
+
+
+def carrier_spectra(x, Fs, f, n_bins=5, method="auto", f_lo=None):
+    """
+    The n_bins DFT bins around the carrier, along the last axis of x.
+    A stacked (M, N) array is transformed in one batched call.
+
+    Returns (S, f_bin) with S of shape (..., n_bins).
+    """
+    x = np.asarray(x)
+    N = x.shape[-1]
+    k_start, k_end, f_bin = carrier_bins(N, Fs, f, n_bins, f_lo)
+
+    if _use_partial_dft(N, n_bins, method):
+        S = partial_dft(x, k_start, k_end)
+    else:
+        bins = np.arange(k_start, k_end) % N
+        S = np.take(np.fft.fft(x, axis=-1), bins, axis=-1)
+
+    return S, f_bin
+
+
+def multi_carrier_spectra(x, Fs, freqs, n_bins=5, method="auto"):
+    """
+    The n_bins bins around each of several carriers, from one transform
+    of x along its last axis: one DFT pass over all bin groups together,
+    or one FFT gathered per group ("auto" picks as in carrier_spectra,
+    counting all groups' bins).
+
+    Returns (S, f_bins) with S of shape (..., n_freqs, n_bins).
+    """
+    x = np.asarray(x)
+    N = x.shape[-1]
+    groups = [carrier_bins(N, Fs, f, n_bins) for f in np.atleast_1d(freqs)]
+    if len({k_end - k_start for k_start, k_end, _ in groups}) != 1:
+        raise ValueError("a carrier is too close to 0 Hz or Nyquist for n_bins")
+
+    bins = np.array([np.arange(k_start, k_end) for k_start, k_end, _ in groups])
+    f_bins = np.array([f_bin for _, _, f_bin in groups])
+
+    if _use_partial_dft(N, bins.size, method):
+        S = dft_bins(x, tuple(bins.ravel().tolist()))
+    elif bins.max() <= N // 2:
+        S = np.take(np.fft.rfft(x, axis=-1), bins.ravel(), axis=-1)
+    else:
+        S = np.take(np.fft.fft(x, axis=-1), bins.ravel(), axis=-1)
 
-    mean_phasor = np.mean(phasors)
+    return S.reshape(S.shape[:-1] + bins.shape), f_bins
+
+
+def estimate_tdoa_phase(x1, x2, Fs, f, n_bins=5, method="auto", f_lo=None):
+    """
+    Phase-based TDOA of x2 relative to x1.
+    Inputs may be batched (..., samples); one delay per leading index.
+
+    method: "fft" (full FFT), "dft" (only the n_bins carrier bins) or
+    "auto" (the DFT path whenever n_bins is small relative to log2(N)).
+
+    For complex baseband input from downconvert(), pass Fs_out and the
+    mixing frequency as f_lo; the phase is then converted with the RF
+    carrier frequency.
+    """
+    x1 = np.asarray(x1)
+    x2 = np.asarray(x2)
+    X1, f_bin = carrier_spectra(x1, Fs, f, n_bins, method, f_lo)
+    X2, _ = carrier_spectra(x2, Fs, f, n_bins, method, f_lo)
+
+    return tdoa_from_bins(X1, X2, f_bin)
+
+
+def tdoa_from_bins(X1, X2, f_bin):
+    """
+    TDOA from already computed carrier bins (..., n_bins) of both sensors.
+    """
+    phasors = X1 * np.conj(X2)
+
+    mean_phasor = np.mean(phasors, axis=-1)
     delta_phi = np.angle(mean_phasor)
 
-    f_bin = freqs[k0]         
     delta_t = delta_phi / (2 * np.pi * f_bin)
 
     return delta_t
 
 
+def estimate_tdoa_multi(x1, x2, Fs, freqs, n_bins=5, method="auto"):
+    """
+    Phase TDOA of x2 relative to x1 at each carrier in freqs, from one
+    shared transform of both sensors. Returns (..., n_freqs) delays.
+
+    No band-pass is needed per carrier: each group only sees its own
+    bins. Carriers closer than n_bins bins share bins and bias each other.
+    """
+    S, f_bins = multi_carrier_spectra(np.stack([x1, x2], axis=-2), Fs, freqs, n_bins, method)
+    return tdoa_from_bins(S[..., 0, :, :], S[..., 1, :, :], f_bins)
+
+
+def estimate_doa_multi(x1, x2, Fs, freqs, d, n_bins=5, method="auto"):
+    """
+    DOA (deg) of the emitter at each carrier in freqs (see estimate_tdoa_multi).
+    """
+    return tdoa_to_doa(estimate_tdoa_multi(x1, x2, Fs, freqs, n_bins, method), d)
+
+
+def pairwise_cross_phasors(X, Fs, f, n_bins=5, method="auto", f_lo=None):
+    """
+    Mean carrier-bin cross-phasor for every sensor pair of an
+    (..., M, N) array, from one batched transform.
+
+    Returns (i, j, P, f_bin): pair indices with i < j and P[..., p], whose
+    angle is the phase of sensor j relative to sensor i.
+    """
+    S, f_bin = carrier_spectra(X, Fs, f, n_bins, method, f_lo)
+
+    i, j = np.triu_indices(X.shape[-2], k=1)
+    P = np.mean(S[..., i, :] * np.conj(S[..., j, :]), axis=-1)
+
+    return i, j, P, f_bin
+
+
+def pairwise_tdoa(X, Fs, f, n_bins=5, method="auto", f_lo=None):
+    """
+    Phase TDOA of sensor j relative to sensor i for all pairs i < j.
+    Delays for baselines over half a wavelength are wrapped.
+
+    Returns (i, j, delta_t).
+    """
+    i, j, P, f_bin = pairwise_cross_phasors(X, Fs, f, n_bins, method, f_lo)
+    return i, j, np.angle(P) / (2 * np.pi * f_bin)
+
+
+def estimate_doa_array(X, positions, Fs, f, n_bins=5, method="auto", f_lo=None):
+    """
+    Least-squares DOA (deg) from all sensor pairs of an (..., M, N) array
+    with elements at positions (m) along a line.
+
+    Pair phases are unwrapped progressively: the fit from the shorter
+    baselines predicts the phase of the next longer ones, which is then
+    unwrapped against that prediction before refitting.
+    """
+    positions = np.asarray(positions, dtype=float)
+    i, j, P, f_bin = pairwise_cross_phasors(X, Fs, f, n_bins, method, f_lo)
+
+    baselines = positions[j] - positions[i]
+    phi = np.angle(P)
+    k = 2 * np.pi * f_bin / C      # phase per metre of baseline per unit sin
+
+    lengths = np.abs(baselines)
+    s = np.zeros(phi.shape[:-1])
+    for b_max in np.unique(lengths):
+        use = lengths <= b_max
+        b = baselines[use]
+        phi_pred = k * b * s[..., None]
+        phi_unw = phi[..., use] + 2 * np.pi * np.round((phi_pred - phi[..., use]) / (2 * np.pi))
+        s = np.sum(b * phi_unw, axis=-1) / (k * np.sum(b ** 2))
+
+    return np.rad2deg(np.arcsin(np.clip(s, -1.0, 1.0)))
+
+
+@lru_cache(maxsize=32)
+def gcc_nfft(N):
+    """
+    Cached FFT length for GCC-PHAT on N-sample frames: the fastest real-FFT
+    size that holds the full linear correlation. gcc_phat applies interp
+    on top of it.
+    """
+    return next_fast_len(2 * N - 1, real=True)
+
+
+def gcc_phat(X, Fs, ref=0, max_tau=None, interp=1, nfft=None):
+    """
+    Broadband TDOA by GCC-PHAT of every channel of an (..., M, N) real
+    array against channel ref.
+
+    All channels go through one batched rfft; the PHAT-weighted cross
+    spectra are zero-padded by interp before irfft, and the correlation
+    peak is refined with parabolic interpolation. max_tau (s) limits the
+    lag search, e.g. to d / C. For fixed frame sizes pass nfft (see
+    gcc_nfft) to reuse one transform size; it is the forward rfft length,
+    and the inverse transform is interp times longer.
+
+    Returns delta_t (..., M): delay of each channel relative to ref.
+    """
+    X = np.asarray(X)
+    N = X.shape[-1]
+    if nfft is None:
+        nfft = gcc_nfft(N)
+    n_corr = nfft * interp
+
+    Xf = np.fft.rfft(X, n=nfft, axis=-1)
+    G = Xf * np.conj(Xf[..., ref:ref + 1, :])
+    G /= np.maximum(np.abs(G), 1e-12)
+
+    cc = np.fft.irfft(G, n=n_corr, axis=-1)
+
+    max_shift = n_corr // 2
+    if max_tau is not None:
+        max_shift = min(max_shift, int(np.ceil(interp * Fs * max_tau)) + 1)
+    cc = np.concatenate((cc[..., n_corr - max_shift:], cc[..., :max_shift + 1]), axis=-1)
+
+    idx = np.argmax(cc, axis=-1)
+    inner = np.clip(idx, 1, cc.shape[-1] - 2)
+    y0 = np.take_along_axis(cc, inner[..., None], axis=-1)[..., 0]
+    ym = np.take_along_axis(cc, inner[..., None] - 1, axis=-1)[..., 0]
+    yp = np.take_along_axis(cc, inner[..., None] + 1, axis=-1)[..., 0]
+
+    denom = ym - 2 * y0 + yp
+    shift = np.where(
+        (idx == inner) & (denom != 0),
+        0.5 * (ym - yp) / np.where(denom != 0, denom, 1),
+        0.0,
+    )
+
+    return (idx - max_shift + shift) / (interp * Fs)
+
+
+def _stage_factors(decim):
+    # Prime factors of decim merged into stages of at most 5 (a prime factor
+    # above 5 is a stage of its own), largest first.
+    primes, n, p = [], decim, 2
+    while n > 1:
+        while n % p == 0:
+            primes.append(p)
+            n //= p
+        p += 1
+    stages = []
+    for p in sorted(primes, reverse=True):
+        if stages and stages[-1] * p <= 5:
+            stages[-1] *= p
+        else:
+            stages.append(p)
+    return sorted(stages, reverse=True)
+
+
+@lru_cache(maxsize=16)
+def _decimator_stages(Fs, f_center, bw, decim, atten_db):
+    """
+    (factor, delay, taps) of each decimation stage. Only what would alias
+    into the final +/- bw / 2 band has to be rejected, so each stage's
+    transition band runs from bw / 2 to its output rate minus bw / 2 and
+    the Kaiser low-pass stays short. Lengths are 2 * factor * delay + 1,
+    so the group delay is exactly delay output samples. The first stage's
+    taps are shifted up to f_center (mixer folded in) and split into
+    real and imaginary parts.
+    """
+    stages = []
+    fs = Fs
+    for D in _stage_factors(decim):
+        fs_out = fs / D
+        numtaps, beta = kaiserord(atten_db, (fs_out - bw) / (fs / 2))
+        q = max(-(-(numtaps - 1) // (2 * D)), 1)
+        h = firwin(2 * D * q + 1, fs_out / 2, window=("kaiser", beta), fs=fs)
+        if not stages:
+            k = np.arange(len(h))
+            h = h * np.exp(2j * np.pi * ((f_center / Fs * k) % 1.0))
+            h = (h.real.copy(), h.imag.copy())
+        stages.append((D, q, h))
+        fs = fs_out
+    return stages
+
+
+def _decimate(h, x, D, q):
+    # Low-pass h and keep every D-th sample, aligned with the input.
+    n_out = -(-x.shape[-1] // D)
+    return upfirdn(h, x, up=1, down=D, axis=-1)[..., q:q + n_out]
+
+
+def downconvert(x, Fs, f_center, decim=20, bw=2000, atten_db=60):
+    """
+    Complex baseband front end for real input, along the last axis.
+
+    Each channel is mixed down by f_center, low-pass filtered to bw / 2
+    and decimated by decim (an integer >= 2), in stages of at most 5 with
+    short polyphase FIRs (atten_db stop-band rejection); a prime factor
+    above 5 is a stage of its own, with a longer filter. The mixer is folded into the
+    first stage's taps, so it runs at that stage's output rate, and later
+    stages filter the real and imaginary parts separately. Output is
+    aligned with the input (filter delays removed) and has ceil(N / decim)
+    samples.
+
+    Returns (z, Fs_out).
+    """
+    if not isinstance(decim, (int, np.integer)) or isinstance(decim, bool) or decim < 2:
+        raise ValueError(f"decim must be an integer >= 2, got {decim!r}")
+    x = np.asarray(x)
+    Fs_out = Fs / decim
+    if bw / 2 >= Fs_out / 2:
+        raise ValueError("decim too large for bw: bw must be below Fs / decim")
+
+    dtype = real_dtype(x)
+    (D, q, (h_re, h_im)), *rest = _decimator_stages(Fs, f_center, bw, decim, atten_db)
+
+    re = _decimate(h_re.astype(dtype), x, D, q)
+    im = _decimate(h_im.astype(dtype), x, D, q)
+    m = (q + np.arange(re.shape[-1])) * D
+    lo = np.exp(-2j * np.pi * ((f_center / Fs * m) % 1.0)).astype(np.result_type(dtype, 1j))
+    re, im = (re * lo.real - im * lo.imag), (re * lo.imag + im * lo.real)
+
+    for D, q, h in rest:
+        h = h.astype(dtype)
+        re = _decimate(h, re, D, q)
+        im = _decimate(h, im, D, q)
+
+    y = np.empty(re.shape, dtype=np.result_type(dtype, 1j))
+    y.real = re
+    y.imag = im
+    return y, Fs_out
+
 
 def tdoa_to_doa(delta_t, d):
     val = (delta_t * C) / d
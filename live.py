@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from signal_model import generate_array_signals, make_rng
+from streaming import StreamingTDOAEstimator
+
+
+class LiveSession:
+    """
+    Background synthetic sensor stream feeding a StreamingTDOAEstimator.
+
+    A worker thread synthesizes chunk-sample blocks of the two sensor
+    signals at rate times real time and pushes them through the streaming
+    estimator; the estimates are kept in a rolling history of the last
+    history_s seconds of signal. Readers call snapshot().
+
+    Parameter changes from update() are debounced: they are applied only
+    once they have been stable for debounce seconds, so dragging a slider
+    does not restart the estimator on every tick. A changed d rebuilds the
+    estimator; theta and noise changes apply to the stream in place, so
+    the estimate can be watched converging to the new angle.
+
+    The worker stops by itself when snapshot() has not been called for
+    idle_timeout seconds (e.g. the browser tab was closed).
+    """
+
+    def __init__(self, theta_deg, noise_sigma, d, Fs=100_000, f=30_000, frame_len=4096,
+                 hop=2048, chunk=2048, rate=1.0, history_s=20.0, debounce=0.5,
+                 idle_timeout=30.0, seed=None):
+        self.Fs = Fs
+        self.f = f
+        self.frame_len = frame_len
+        self.hop = hop
+        self.chunk = chunk
+        self.rate = rate
+        self.debounce = debounce
+        self.idle_timeout = idle_timeout
+
+        self._params = (float(theta_deg), float(noise_sigma), float(d))
+        self._pending = None
+        self._pending_since = 0.0
+        self._estimator = self._make_estimator(d)
+        self._estimator_start = 0    # stream sample index the estimator started at
+        self._rng = make_rng(seed)
+
+        n_hist = int(history_s * Fs / hop) + 1
+        self._history = deque(maxlen=n_hist)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._n = 0
+        self._restarts = 0
+        self._last_seen = time.monotonic()
+
+    def _make_estimator(self, d):
+        return StreamingTDOAEstimator(self.Fs, self.f, d, self.frame_len, self.hop)
+
+    # ---------------- control ---------------- #
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._last_seen = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="doa-live", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def update(self, theta_deg, noise_sigma, d):
+        """
+        Request new parameters; applied after debounce seconds without
+        further changes.
+        """
+        params = (float(theta_deg), float(noise_sigma), float(d))
+        with self._lock:
+            if params == self._params:
+                self._pending = None
+            elif params != self._pending:
+                self._pending = params
+                self._pending_since = time.monotonic()
+
+    def snapshot(self):
+        """
+        Dict with the current parameters, the latest estimate and the
+        history as arrays (time s, true theta, estimated theta).
+        """
+        with self._lock:
+            self._last_seen = time.monotonic()
+            hist = np.array(self._history, dtype=float).reshape(-1, 3)
+            theta, noise_sigma, d = self._params
+            return {
+                "theta": theta,
+                "noise_sigma": noise_sigma,
+                "d": d,
+                "pending": self._pending is not None,
+                "running": self.running,
+                "restarts": self._restarts,
+                "stream_time": self._n / self.Fs,
+                "time": hist[:, 0],
+                "theta_true": hist[:, 1],
+                "theta_est": hist[:, 2],
+                "latest": float(hist[-1, 2]) if len(hist) else None,
+            }
+
+    # ---------------- worker ---------------- #
+
+    def _apply_pending(self, now):
+        # Called with the lock held.
+        if self._pending is None or now - self._pending_since < self.debounce:
+            return
+        if self._pending[2] != self._params[2]:
+            self._estimator = self._make_estimator(self._pending[2])
+            self._estimator_start = self._n
+            self._restarts += 1
+        self._params = self._pending
+        self._pending = None
+
+    def _run(self):
+        t0 = time.monotonic()
+        n_start = self._n
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._lock:
+                if now - self._last_seen > self.idle_timeout:
+                    break
+                self._apply_pending(now)
+                theta, noise_sigma, d = self._params
+                estimator = self._estimator
+                start = self._estimator_start
+
+            t = (self._n + np.arange(self.chunk)) / self.Fs
+            x, _ = generate_array_signals(t, self.f, theta, [0.0, d], noise_sigma,
+                                          rng=self._rng)
+            estimates = estimator.push(x)
+
+            with self._lock:
+                self._history.extend(
+                    ((start + n_seen) / self.Fs, theta, th) for n_seen, _, th in estimates
+                )
+                self._n += self.chunk
+
+            if self.rate > 0:
+                due = t0 + (self._n - n_start) / (self.Fs * self.rate)
+                self._stop.wait(max(0.0, due - time.monotonic()))
@@ -1,13 +1,31 @@
+import argparse
+import os
+import sys
+from contextlib import nullcontext
+
 import numpy as np
-import matplotlib.pyplot as plt
 
-from signal_model import generate_time_axis, generate_signals
-from doa_algorithm import bandpass_filter, estimate_tdoa_phase, tdoa_to_doa
+from pipeline import DOAPipeline
+from profiling import is_profiling, profile_stages, stage
 
 
 # ---------------- PLOTTING FUNCTIONS ---------------- #
+# matplotlib is imported on first use so batch runs without plots never load it.
+
+def show_figure(name):
+    import matplotlib.pyplot as plt
+
+    # Layout and draw are timed as the figure's render stage when profiling.
+    with stage(f"render: {name}"):
+        plt.tight_layout()
+        if is_profiling():
+            plt.gcf().canvas.draw()
+    plt.show()
+
 
 def plot_time_domain(t, x1, x2, title):
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(10, 4))
     plt.plot(t[:2000], x1[:2000], label="Sensor 1")
     plt.plot(t[:2000], x2[:2000], label="Sensor 2")
@@ -15,23 +33,20 @@ def plot_time_domain(t, x1, x2, title):
     plt.ylabel("Amplitude")
     plt.title(title)
     plt.legend()
-    plt.tight_layout()
-    plt.show()
+    show_figure(title)
 
 
-def plot_frequency_domain(x1, x2, Fs, f_center, title):
-    N = len(x1)
-    freqs = np.fft.fftfreq(N, 1 / Fs)
+def plot_frequency_domain(freqs, X1, X2, f_center, title):
+    import matplotlib.pyplot as plt
 
-    X1 = np.fft.fft(x1)
-    X2 = np.fft.fft(x2)
+    from plotting import spectrum_traces
 
-    mag1_db = 20 * np.log10(np.abs(X1) + 1e-12)
-    mag2_db = 20 * np.log10(np.abs(X2) + 1e-12)
+    # Full resolution around the signal, min-max decimated elsewhere
+    (f1, mag1_db), (f2, mag2_db) = spectrum_traces(freqs, [X1, X2], f_center)
 
     plt.figure(figsize=(10, 4))
-    plt.plot(freqs[:N // 2], mag1_db[:N // 2], label="Sensor 1")
-    plt.plot(freqs[:N // 2], mag2_db[:N // 2], label="Sensor 2")
+    plt.plot(f1, mag1_db, label="Sensor 1")
+    plt.plot(f2, mag2_db, label="Sensor 2")
 
     plt.xlim(f_center - 5000, f_center + 5000)  # zoom around signal
     plt.xlabel("Frequency (Hz)")
@@ -39,11 +54,12 @@ def plot_frequency_domain(x1, x2, Fs, f_center, title):
     plt.title(title)
     plt.legend()
     plt.grid(True)
-    plt.tight_layout()
-    plt.show()
+    show_figure(title)
 
 
 def plot_doa_diagram(theta_true, theta_est, d):
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(5, 5))
 
     # Sensor positions
@@ -83,13 +99,33 @@ def plot_doa_diagram(theta_true, theta_est, d):
     plt.legend()
     plt.grid(True)
     plt.axis("equal")
-    plt.tight_layout()
-    plt.show()
+    show_figure("Direction of Arrival (Top View)")
+
+
+def plot_batch_results(rows):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 4))
+    if rows and "file" in rows[0]:
+        for path in dict.fromkeys(r["file"] for r in rows):
+            sel = [r for r in rows if r["file"] == path]
+            plt.plot([r["time"] for r in sel], [r["theta_est"] for r in sel],
+                     label=os.path.basename(path))
+        plt.xlabel("Time (s)")
+        plt.ylabel("Estimated DOA (deg)")
+        plt.legend()
+    else:
+        plt.scatter([r["theta"] for r in rows], [r["error"] for r in rows], s=8)
+        plt.xlabel("True Angle (deg)")
+        plt.ylabel("Estimation Error (deg)")
+    plt.title("Batch Results")
+    plt.grid(True)
+    show_figure("Batch Results")
 
 
 # ---------------- MAIN EXPERIMENT ---------------- #
 
-def main():
+def main(seed=None, cache=None):
     # PARAMETERS (underwater case)
     Fs = 100_000
     T = 0.2
@@ -99,9 +135,18 @@ def main():
     theta_true = float(input("Enter source angle (deg): "))
     noise_sigma = float(input("Enter noise level (e.g. 0.01): "))
 
-    # Generate signals
-    t = generate_time_axis(Fs, T)
-    x1, x2, _ = generate_signals(t, f, theta_true, d, noise_sigma)
+    # Generate, filter and estimate in one pass (served from the result
+    # cache when the same inputs were run before with the same seed)
+    pipeline = DOAPipeline(Fs, T, f, d)
+    if cache is not None:
+        from result_cache import run_cached
+
+        result = run_cached(pipeline, theta_true, noise_sigma, seed, cache)
+    else:
+        result = pipeline.run(theta_true, noise_sigma, rng=seed)
+    t = result.t
+    x1, x2 = result.x
+    x1f, x2f = result.xf
 
     # STEP 1: Time-domain noisy signals
     if input("Show time-domain noisy signals? (y/n): ").lower() == "y":
@@ -110,13 +155,9 @@ def main():
     # STEP 2: Frequency-domain (raw)
     if input("Show frequency-domain signals? (y/n): ").lower() == "y":
         plot_frequency_domain(
-            x1, x2, Fs, f, "Frequency-Domain (Before Filtering)"
+            result.freqs, *result.X, f, "Frequency-Domain (Before Filtering)"
         )
 
-    # Filtering
-    x1f = bandpass_filter(x1, Fs, f)
-    x2f = bandpass_filter(x2, Fs, f)
-
     # STEP 3: Filtered time-domain
     if input("Show filtered time-domain signals? (y/n): ").lower() == "y":
         plot_time_domain(t, x1f, x2f, "Filtered Time-Domain Signals")
@@ -124,19 +165,124 @@ def main():
     # STEP 4: Filtered frequency-domain
     if input("Show filtered frequency-domain signals? (y/n): ").lower() == "y":
         plot_frequency_domain(
-            x1f, x2f, Fs, f, "Frequency-Domain (After Band-Pass Filtering)"
+            result.freqs, *result.Xf, f, "Frequency-Domain (After Band-Pass Filtering)"
         )
 
     # STEP 5: DOA estimation
-    delta_t = estimate_tdoa_phase(x1f, x2f, Fs, f)
-    theta_est = tdoa_to_doa(delta_t, d)
+    theta_est = result.theta_est
 
     print(f"\nTrue Angle      : {theta_true:.2f}°")
     print(f"Estimated Angle : {theta_est:.2f}°")
 
+    from adaptive import estimate_doa_adaptive
+
+    adaptive = estimate_doa_adaptive(x1, x2, Fs, f, d)
+    status = "" if adaptive.converged else " (target not reached)"
+    print(f"Adaptive        : {adaptive.theta_est:.2f}° ± {adaptive.std_deg:.3f}° "
+          f"after {adaptive.t_used * 1e3:.0f} of {T * 1e3:.0f} ms{status}")
+
     if input("Show DOA diagram? (y/n): ").lower() == "y":
         plot_doa_diagram(theta_true, theta_est, d)
 
 
+# ---------------- BATCH MODE ---------------- #
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Underwater DOA experiment. Without --angles or --files "
+                    "it runs interactively.",
+    )
+    parser.add_argument("--angles", help='source angles (deg): "a,b,c" or "start:stop:step"')
+    parser.add_argument("--noise", default="0.01", help="noise sigmas, same syntax as --angles")
+    parser.add_argument("--repeats", type=int, default=1, help="runs per (angle, noise) cell")
+    parser.add_argument("--seed", type=int,
+                        help="root seed for reproducible noise (enables the result cache)")
+    parser.add_argument("--cache-dir", help="result cache directory "
+                        "(default: $DOA_CACHE_DIR or ~/.cache/doa-lab)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the result cache")
+    parser.add_argument("--files", nargs="+", help="WAV or raw interleaved recordings")
+    parser.add_argument("--raw-channels", type=int, default=2)
+    parser.add_argument("--raw-dtype", default="int16")
+    parser.add_argument("--window", type=int, default=20_000, help="samples per DOA window")
+    parser.add_argument("--hop", type=int, help="samples between windows (default: window)")
+    parser.add_argument("--Fs", type=float, default=100_000)
+    parser.add_argument("--T", type=float, default=0.2)
+    parser.add_argument("--f", type=float, default=30_000)
+    parser.add_argument("--d", type=float, default=0.02)
+    parser.add_argument("--decim", type=int,
+                        help="batch runs: estimate from complex baseband decimated by DECIM")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=1, help="jobs per worker task")
+    parser.add_argument("--output", default="doa_results.csv", help=".csv, .json or .jsonl")
+    parser.add_argument("--plot", action="store_true", help="plot the results when done")
+    parser.add_argument("--profile-json", metavar="PATH",
+                        help='write per-stage timing / memory JSON to PATH '
+                             '("-" for stdout, batch mode only)')
+    args = parser.parse_args(argv)
+    if args.decim is not None and args.decim < 2:
+        parser.error("--decim must be at least 2")
+    if args.profile_json == "-" and not (args.angles or args.files):
+        # Interactive prompts and results go to stdout too.
+        parser.error("--profile-json - needs --angles or --files; give a path instead")
+    return args
+
+
+def run_batch(args, profile=None):
+    import batch
+
+    if args.files:
+        jobs = batch.file_jobs(args.files, args.Fs, args.f, args.d, args.window,
+                               args.hop, args.raw_channels, args.raw_dtype, args.decim)
+        fn = batch.run_file_job
+    else:
+        jobs = batch.grid_jobs(batch.parse_values(args.angles), batch.parse_values(args.noise),
+                               args.repeats, args.Fs, args.T, args.f, args.d, args.seed,
+                               cache_dir(args), args.decim)
+        fn = batch.run_grid_job
+
+    rows, records = batch.run_jobs(fn, jobs, args.workers, args.chunksize,
+                                   profile=profile is not None)
+    if profile is not None:
+        profile.records.extend(records)
+    batch.write_results(rows, args.output)
+    # Keep stdout clean for --profile-json -
+    out = sys.stderr if args.profile_json == "-" else sys.stdout
+    print(f"{len(jobs)} runs, {len(rows)} rows -> {args.output}", file=out)
+
+    if args.plot:
+        plot_batch_results(rows)
+
+
+def cache_dir(args):
+    # Only seeded runs are reproducible, so only they use the cache.
+    if args.no_cache or args.seed is None:
+        return None
+    from result_cache import DEFAULT_CACHE_DIR
+
+    return args.cache_dir or os.environ.get("DOA_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def write_profile(profile, path):
+    text = profile.to_json(indent=1)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w") as fh:
+            fh.write(text)
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    with (profile_stages() if args.profile_json else nullcontext()) as profile:
+        if args.angles or args.files:
+            run_batch(args, profile)
+        else:
+            path = cache_dir(args)
+            if path is None:
+                main(args.seed)
+            else:
+                from result_cache import default_cache
+
+                main(args.seed, default_cache(path))
+    if profile is not None:
+        write_profile(profile, args.profile_json)
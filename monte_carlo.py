@@ -0,0 +1,180 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy.signal import sosfreqz
+
+from signal_model import (
+    generate_time_axis,
+    generate_array_signals,
+    make_rng,
+    spawn_rngs,
+)
+from doa_algorithm import (
+    bandpass_filter,
+    butter_bandpass_sos,
+    carrier_bins,
+    downconvert,
+    estimate_tdoa_phase,
+    partial_dft,
+    tdoa_from_bins,
+    tdoa_to_doa,
+)
+
+# Trials per block in the frequency-domain mode (each trial is only
+# M * n_bins complex values).
+_FREQ_BLOCK = 1 << 16
+
+
+@lru_cache(maxsize=32)
+def _noise_gain(N, Fs, f, n_bins, bw):
+    # Zero-phase (filtfilt) power response |H|^2 of the band-pass at the
+    # carrier bins.
+    k_start, k_end, _ = carrier_bins(N, Fs, f, n_bins)
+    k = np.arange(k_start, k_end)
+    _, H = sosfreqz(butter_bandpass_sos(Fs, f, bw), worN=k * Fs / N, fs=Fs)
+    return np.abs(H) ** 2
+
+
+@lru_cache(maxsize=64)
+def _tone_bins(N, Fs, f, theta_deg, positions, n_bins, bw, filtered):
+    # Carrier bins of the noiseless (optionally band-passed) tones, computed
+    # once through the time-domain path so leakage, filter response and
+    # filtfilt edge effects are all exact.
+    t = np.arange(N) * (1 / Fs)
+    X, _ = generate_array_signals(t, f, theta_deg, positions, 0.0, rng=0)
+    if filtered:
+        X = bandpass_filter(X, Fs, f, bw)
+    k_start, k_end, f_bin = carrier_bins(N, Fs, f, n_bins)
+    return partial_dft(X, k_start, k_end), f_bin
+
+
+def generate_bin_spectra(N, Fs, f, theta_deg, positions, noise_sigma, n_trials,
+                         n_bins=5, bw=2000, filtered=True, rng=None):
+    """
+    Carrier-bin DFT values of n_trials noisy N-sample captures, synthesized
+    directly in the frequency domain.
+
+    The tone part is the same for every trial and is computed once (and
+    cached) from the noiseless tone, so it includes spectral leakage and,
+    with filtered, the band-pass response and its edge transients. White
+    noise of variance sigma^2 adds independent circular complex Gaussians
+    of variance N * sigma^2 per bin, scaled by the filter's |H(f_k)|^2.
+
+    Returns (S, f_bin) with S of shape (n_trials, M, n_bins).
+    """
+    positions = tuple(float(p) for p in positions)
+    tone, f_bin = _tone_bins(N, Fs, f, float(theta_deg), positions, n_bins, bw, filtered)
+
+    rng = make_rng(rng)
+    noise = rng.standard_normal((n_trials,) + tone.shape + (2,))
+    S = noise.view(np.complex128)[..., 0]
+    S *= noise_sigma * np.sqrt(N / 2)
+
+    if filtered:
+        S *= _noise_gain(N, Fs, f, n_bins, bw)
+    S += tone
+
+    return S, f_bin
+
+
+def run_monte_carlo(
+    angles,
+    noise_sigmas,
+    n_trials,
+    Fs=100_000,
+    T=0.2,
+    f=30_000,
+    d=0.02,
+    n_bins=5,
+    max_block=256,
+    decim=None,
+    dtype=np.float64,
+    seed=None,
+    mode="time",
+    bw=2000,
+):
+    """
+    Vectorized DOA accuracy sweep over an (angle, noise sigma) grid.
+
+    Every cell runs n_trials realizations, synthesized, filtered and
+    transformed as (trials x samples) blocks of at most max_block rows.
+    With decim set, the band-pass stage is replaced by the complex
+    baseband front end (downconvert) and estimation runs at Fs / decim.
+
+    dtype=np.float32 runs synthesis, filtering and estimation in single
+    precision (see README for the accuracy bound).
+
+    Each cell draws its noise from its own stream spawned from seed, so a
+    fixed seed gives identical results for any max_block, and cells can be
+    split across processes without sharing noise.
+
+    mode="freq" skips the time domain: each trial's carrier bins come from
+    generate_bin_spectra, so a trial costs O(n_bins) instead of
+    O(N log N). It models the same signal, noise and band-pass statistics;
+    see benchmarks/validate_freq_mode.py for the check against mode="time".
+
+    Returns a dict with bias, rmse and variance (deg) of shape
+    (len(angles), len(noise_sigmas)).
+    """
+    if mode not in ("time", "freq"):
+        raise ValueError(f"Unknown mode: {mode!r}")
+    if mode == "freq" and decim is not None:
+        raise ValueError("decim only applies to mode='time'")
+
+    angles = np.atleast_1d(np.asarray(angles, dtype=float))
+    noise_sigmas = np.atleast_1d(np.asarray(noise_sigmas, dtype=float))
+
+    t = generate_time_axis(Fs, T)
+
+    shape = (len(angles), len(noise_sigmas))
+    bias = np.empty(shape)
+    rmse = np.empty(shape)
+    variance = np.empty(shape)
+
+    theta_est = np.empty(n_trials)
+    rngs = spawn_rngs(seed, len(angles) * len(noise_sigmas))
+
+    for i, theta in enumerate(angles):
+        for j, sigma in enumerate(noise_sigmas):
+            rng = rngs[i * len(noise_sigmas) + j]
+            block = _FREQ_BLOCK if mode == "freq" else max_block
+            for start in range(0, n_trials, block):
+                n = min(block, n_trials - start)
+
+                if mode == "freq":
+                    S, f_bin = generate_bin_spectra(
+                        len(t), Fs, f, theta, [0.0, d], sigma, n, n_bins, bw, rng=rng
+                    )
+                    theta_est[start:start + n] = tdoa_to_doa(
+                        tdoa_from_bins(S[:, 0], S[:, 1], f_bin), d
+                    )
+                    continue
+
+                X, _ = generate_array_signals(
+                    t, f, theta, [0.0, d], sigma, n_trials=n, dtype=dtype, rng=rng
+                )
+
+                if decim is None:
+                    Xf = bandpass_filter(X, Fs, f, bw)
+                    delta_t = estimate_tdoa_phase(Xf[:, 0], Xf[:, 1], Fs, f, n_bins)
+                else:
+                    Z, Fs_out = downconvert(X, Fs, f, decim, bw)
+                    delta_t = estimate_tdoa_phase(
+                        Z[:, 0], Z[:, 1], Fs_out, f, n_bins, f_lo=f
+                    )
+
+                theta_est[start:start + n] = tdoa_to_doa(delta_t, d)
+
+            err = theta_est - theta
+            bias[i, j] = np.mean(err)
+            rmse[i, j] = np.sqrt(np.mean(err ** 2))
+            variance[i, j] = np.var(theta_est)
+
+    return {
+        "angles": angles,
+        "noise_sigmas": noise_sigmas,
+        "n_trials": n_trials,
+        "bias": bias,
+        "rmse": rmse,
+        "variance": variance,
+    }
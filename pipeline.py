@@ -0,0 +1,126 @@
+from collections import namedtuple
+
+import numpy as np
+from scipy.signal import sosfiltfilt
+
+from profiling import stage
+from signal_model import generate_time_axis, generate_array_signals
+from doa_algorithm import (
+    butter_bandpass_sos,
+    carrier_bins,
+    downconvert,
+    estimate_tdoa_phase,
+    tdoa_from_bins,
+    tdoa_to_doa,
+)
+
+
+# Bump when a change to synthesis, filtering or estimation changes results;
+# cached results (see result_cache) from older versions are then ignored.
+ALGORITHM_VERSION = "1"
+
+
+DOAResult = namedtuple(
+    "DOAResult",
+    [
+        "t",          # time axis (s)
+        "x",          # raw sensor signals, (2, N)
+        "xf",         # band-pass filtered signals, (2, N)
+        "freqs",      # one-sided frequency axis (Hz), N // 2 + 1
+        "X",          # one-sided spectra of x, (2, N // 2 + 1)
+        "Xf",         # one-sided spectra of xf, (2, N // 2 + 1)
+        "delta_t",    # estimated TDOA (s)
+        "theta_est",  # estimated DOA (deg)
+        "tau",        # true TDOA (s), None for recorded input
+    ],
+)
+
+
+class DOAPipeline:
+    """
+    Synthesis -> band-pass -> phase TDOA -> DOA, configured once.
+
+    The time axis, frequency axis, filter design and carrier bins are
+    computed at construction. Each run returns a DOAResult carrying the
+    raw and filtered spectra alongside the estimate, so plots reuse the
+    spectra that estimation already needed instead of transforming again.
+
+    dtype selects the signal precision (float32 gives complex64 spectra);
+    the time axis stays float64 for phase accuracy.
+
+    With decim set, the band-pass and full-rate spectra are replaced by the
+    complex baseband front end (downconvert) and estimation runs at
+    Fs / decim; xf, X and Xf of the result are then None.
+    """
+
+    def __init__(self, Fs, T, f, d, bw=2000, n_bins=5, dtype=np.float64, decim=None):
+        self.Fs = Fs
+        self.T = T
+        self.f = f
+        self.d = d
+        self.bw = bw
+        self.n_bins = n_bins
+        self.dtype = np.dtype(dtype)
+        self.decim = decim
+
+        self.t = generate_time_axis(Fs, T)
+        self.N = len(self.t)
+        self.freqs = np.fft.rfftfreq(self.N, 1 / Fs)
+        # Cast once to the working precision, so runs skip bandpass_filter's
+        # per-call design lookup and cast.
+        self.sos = butter_bandpass_sos(Fs, f, bw).astype(self.dtype)
+
+        self.k_start, self.k_end, self.f_bin = carrier_bins(self.N, Fs, f, n_bins)
+
+    def run(self, theta_deg, noise_sigma, rng=None):
+        """
+        Synthesize one noisy capture at theta_deg and process it.
+        rng is a seed or np.random.Generator for the noise.
+        """
+        with stage("generate_signals"):
+            x, taus = generate_array_signals(
+                self.t, self.f, theta_deg, [0.0, self.d], noise_sigma,
+                dtype=self.dtype, rng=rng,
+            )
+        return self.process(x, taus[1])
+
+    def process(self, x, tau=None):
+        """
+        Process a (2, N) capture, N matching the configured duration.
+        """
+        x = np.asarray(x)
+        if x.shape != (2, self.N):
+            raise ValueError(f"expected shape (2, {self.N}), got {x.shape}")
+
+        if self.decim is not None:
+            return self._process_baseband(x, tau)
+
+        with stage("bandpass_filter"):
+            xf = sosfiltfilt(self.sos, x, axis=-1)
+
+        with stage("fft"):
+            X = np.fft.rfft(x, axis=-1)
+            Xf = np.fft.rfft(xf, axis=-1)
+
+        with stage("estimate_tdoa_phase"):
+            if self.k_end <= Xf.shape[-1]:
+                bins = slice(self.k_start, self.k_end)
+                delta_t = tdoa_from_bins(Xf[0, bins], Xf[1, bins], self.f_bin)
+            else:
+                # Bin group runs past Nyquist; fall back to the full estimator.
+                delta_t = estimate_tdoa_phase(xf[0], xf[1], self.Fs, self.f, self.n_bins)
+
+            theta_est = tdoa_to_doa(delta_t, self.d)
+
+        return DOAResult(self.t, x, xf, self.freqs, X, Xf, delta_t, theta_est, tau)
+
+    def _process_baseband(self, x, tau):
+        with stage("downconvert"):
+            z, Fs_out = downconvert(x, self.Fs, self.f, self.decim, self.bw)
+
+        with stage("estimate_tdoa_phase"):
+            delta_t = estimate_tdoa_phase(z[0], z[1], Fs_out, self.f, self.n_bins,
+                                          f_lo=self.f)
+            theta_est = tdoa_to_doa(delta_t, self.d)
+
+        return DOAResult(self.t, x, None, self.freqs, None, None, delta_t, theta_est, tau)
@@ -0,0 +1,114 @@
+"""
+Screen-resolution plotting helpers for long traces and spectra.
+
+Traces are min-max decimated: every bucket of samples keeps its smallest
+and largest point, so peaks and the noise envelope survive while the
+number of points sent to the renderer stays fixed whatever the signal
+length. multires() keeps a window of interest (e.g. around f_center) at
+full resolution, up to n_detail points, and decimates the rest.
+
+The plotly figure builders import plotly on first use, so the decimation
+helpers can be used with matplotlib alone.
+"""
+
+import numpy as np
+
+
+def minmax_decimate(x, y, n_out=2000):
+    """
+    At most about n_out points of (x, y) keeping each bucket's min and max,
+    in their original order. Short inputs are returned unchanged.
+    """
+    y = np.asarray(y)
+    N = len(y)
+    if N <= n_out:
+        return x, y
+
+    n_buckets = max(n_out // 2, 1)
+    b = -(-N // n_buckets)
+    # Pad with the last value; argmin/argmax return first occurrences, so
+    # the padding itself is never picked over a real sample.
+    pad = n_buckets * b - N
+    yb = np.concatenate([y, np.full(pad, y[-1])]).reshape(n_buckets, b)
+
+    base = np.arange(n_buckets) * b
+    idx = np.concatenate([base + yb.argmin(axis=1), base + yb.argmax(axis=1), [0, N - 1]])
+    idx = np.unique(np.minimum(idx, N - 1))
+    return x[idx], y[idx]
+
+
+def multires(x, y, lo=None, hi=None, n_out=2000, n_detail=4000):
+    """
+    (x, y) with [lo, hi] (x sorted) at full resolution, or decimated to
+    n_detail points if longer, and the rest min-max decimated to about
+    n_out points. Without a window the whole trace is decimated to n_out.
+    """
+    if lo is None or hi is None:
+        return minmax_decimate(x, y, n_out)
+
+    i0, i1 = np.searchsorted(x, [lo, hi])
+    i0 = max(i0 - 1, 0)
+    i1 = min(i1 + 1, len(x))
+
+    parts = [
+        minmax_decimate(x[:i0], y[:i0], n_out // 2),
+        minmax_decimate(x[i0:i1], y[i0:i1], n_detail),
+        minmax_decimate(x[i1:], y[i1:], n_out // 2),
+    ]
+    return (np.concatenate([p[0] for p in parts]),
+            np.concatenate([p[1] for p in parts]))
+
+
+def magnitude_db(X):
+    return 20 * np.log10(np.abs(X) + 1e-12)
+
+
+def spectrum_traces(freqs, spectra, f_center, zoom=5000, n_out=2000, n_detail=4000):
+    """
+    Decimated (freqs, dB) pairs of each spectrum, full resolution within
+    f_center +/- zoom. Magnitudes are decimated before the log, which
+    keeps the same points since the log is monotonic.
+    """
+    traces = []
+    for X in spectra:
+        fx, mag = multires(freqs, np.abs(X), f_center - zoom, f_center + zoom,
+                           n_out, n_detail)
+        traces.append((fx, magnitude_db(mag)))
+    return traces
+
+
+def spectrum_figure(freqs, spectra, names, f_center, title, zoom=5000,
+                    n_out=2000, n_detail=4000):
+    """
+    Plotly figure of the magnitude spectra (dB), initially zoomed to
+    f_center +/- zoom; zooming out shows the decimated overview.
+    """
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for (fx, db), name in zip(spectrum_traces(freqs, spectra, f_center, zoom,
+                                              n_out, n_detail), names):
+        fig.add_trace(go.Scatter(x=fx, y=db, mode="lines", name=name))
+    fig.update_layout(title=title, xaxis_title="Frequency (Hz)",
+                      yaxis_title="Magnitude (dB)", height=350,
+                      margin=dict(l=40, r=20, t=50, b=40))
+    fig.update_xaxes(range=[f_center - zoom, f_center + zoom])
+    return fig
+
+
+def time_figure(t, traces, names, title, t_end=None, n_out=2000, n_detail=4000):
+    """
+    Plotly figure of time traces, initially showing [t[0], t_end] at full
+    resolution with the rest of the capture decimated.
+    """
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for y, name in zip(traces, names):
+        tx, yx = multires(t, y, t[0], t_end, n_out, n_detail)
+        fig.add_trace(go.Scatter(x=tx, y=yx, mode="lines", name=name))
+    fig.update_layout(title=title, xaxis_title="Time (s)", yaxis_title="Amplitude",
+                      height=350, margin=dict(l=40, r=20, t=50, b=40))
+    if t_end is not None:
+        fig.update_xaxes(range=[t[0], t_end])
+    return fig
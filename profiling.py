@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_active = ContextVar("doa_profile", default=None)
+
+# tracemalloc is process-wide, so concurrent profiles (threads, Streamlit
+# sessions) share one tracing session: the first to need it starts it and
+# the last one out stops it. Tracing started by someone else is left alone.
+_trace_lock = threading.Lock()
+_trace_users = 0
+_trace_owned = False
+
+
+def _acquire_tracing():
+    global _trace_users, _trace_owned
+    with _trace_lock:
+        if _trace_users == 0:
+            _trace_owned = not tracemalloc.is_tracing()
+            if _trace_owned:
+                tracemalloc.start()
+        _trace_users += 1
+
+
+def _release_tracing():
+    global _trace_users, _trace_owned
+    with _trace_lock:
+        _trace_users -= 1
+        if _trace_users == 0 and _trace_owned:
+            tracemalloc.stop()
+            _trace_owned = False
+
+
+class StageProfile:
+    """
+    Per-stage wall time, CPU time and peak traced allocation, collected
+    while a profile_stages() block is active.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._stack = []
+
+    def summary(self):
+        """
+        Aggregate records by stage name: call count, total wall / CPU
+        time and the largest peak allocation.
+        """
+        out = {}
+        for r in self.records:
+            s = out.setdefault(r["stage"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                            "peak_bytes": 0})
+            s["calls"] += 1
+            s["wall_s"] += r["wall_s"]
+            s["cpu_s"] += r["cpu_s"]
+            s["peak_bytes"] = max(s["peak_bytes"], r["peak_bytes"])
+        return out
+
+    def to_dict(self):
+        return {"stages": self.summary(), "records": self.records}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+def is_profiling():
+    return _active.get() is not None
+
+
+@contextmanager
+def profile_stages(trace_memory=True):
+    """
+    Record every stage() entered in this context (thread / task).
+
+        with profile_stages() as prof:
+            pipeline.run(theta, sigma)
+        print(prof.summary())
+
+    With trace_memory, tracemalloc runs for the duration of the block
+    (reference-counted across concurrent blocks). Its peak counter is
+    process-wide too, so peaks of overlapping traced blocks may include
+    each other's allocations.
+    """
+    prof = StageProfile(trace_memory)
+    if trace_memory:
+        _acquire_tracing()
+
+    token = _active.set(prof)
+    try:
+        yield prof
+    finally:
+        _active.reset(token)
+        if trace_memory:
+            _release_tracing()
+
+
+@contextmanager
+def stage(name):
+    """
+    Time one pipeline stage. A no-op unless profile_stages() is active.
+    Stages may nest; a parent's peak includes its children's.
+    """
+    prof = _active.get()
+    if prof is None:
+        yield
+        return
+
+    tracing = prof.trace_memory and tracemalloc.is_tracing()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if prof._stack:
+            prof._stack[-1][1] = max(prof._stack[-1][1], peak)
+        tracemalloc.reset_peak()
+    else:
+        current = 0
+
+    frame = [current, 0]
+    prof._stack.append(frame)
+    wall0 = time.perf_counter()
+    cpu0 = time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall0
+        cpu = time.process_time() - cpu0
+        prof._stack.pop()
+
+        peak_bytes = 0
+        if tracing:
+            peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+            peak_bytes = max(peak - frame[0], 0)
+            if prof._stack:
+                prof._stack[-1][1] = max(prof._stack[-1][1], peak)
+
+        prof.records.append({
+            "stage": name,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "peak_bytes": peak_bytes,
+        })
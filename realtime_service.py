@@ -0,0 +1,462 @@
+"""
+Asyncio ingestion service for live sensor streams.
+
+Senders push framed sample packets over UDP or TCP. Each packet is a
+PACKET_HEADER followed by n_channels * n_samples float32 samples, channel
+by channel:
+
+    seq           uint32   packet counter (gaps = lost UDP packets)
+    sample_index  uint64   stream index of the packet's first sample
+    n_channels    uint16
+    n_samples     uint16
+    t_sent        float64  sender wall-clock time (s) of the last sample
+
+Over TCP packets are simply sent back to back. Samples go into a bounded
+SampleRing; every completed window is estimated in an executor, off the
+event loop, and published as a dict on DOAService.estimates. A jump in
+sample_index (lost packets) discards the partial windows before it, so no
+window ever spans a gap, and estimates carry the sender's stream index.
+
+Run a server and a simulator in one process to load-test on one machine:
+
+    python realtime_service.py loadtest --rate 4 --T 5
+"""
+
+import argparse
+import asyncio
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+from doa_algorithm import bandpass_filter, estimate_doa_array, estimate_tdoa_phase, tdoa_to_doa
+from signal_model import generate_array_signals, generate_time_axis
+
+
+PACKET_HEADER = struct.Struct("<IQHHd")
+
+# Largest UDP payload over IPv4.
+MAX_DATAGRAM = 65507
+
+
+def max_udp_packet(n_channels):
+    """
+    Most samples per channel that fit one UDP datagram.
+    """
+    return (MAX_DATAGRAM - PACKET_HEADER.size) // (4 * n_channels)
+
+
+def pack_packet(seq, sample_index, block, t_sent):
+    """
+    Frame an (M, n) block as one packet.
+    """
+    block = np.ascontiguousarray(block, dtype="<f4")
+    M, n = block.shape
+    return PACKET_HEADER.pack(seq, sample_index, M, n, t_sent) + block.tobytes()
+
+
+def unpack_packet(data):
+    """
+    Inverse of pack_packet: (seq, sample_index, block, t_sent).
+    """
+    seq, sample_index, M, n, t_sent = PACKET_HEADER.unpack_from(data)
+    if len(data) != PACKET_HEADER.size + 4 * M * n:
+        raise ValueError("packet length does not match its header")
+    block = np.frombuffer(data, dtype="<f4", offset=PACKET_HEADER.size).reshape(M, n)
+    return seq, sample_index, block, t_sent
+
+
+class SampleRing:
+    """
+    Bounded (M, capacity) sample ring with a sliding window reader.
+
+    write() never blocks: if the reader falls more than capacity samples
+    behind, the oldest unread samples are dropped and counted in overruns.
+    """
+
+    def __init__(self, n_channels, capacity, dtype=np.float32):
+        self._buf = np.zeros((n_channels, capacity), dtype=dtype)
+        self.capacity = capacity
+        self.head = 0        # total samples written
+        self.tail = 0        # stream index of the next window start
+        self.overruns = 0    # samples dropped unread
+
+    @property
+    def depth(self):
+        return self.head - self.tail
+
+    def write(self, block):
+        n = block.shape[1]
+        if n > self.capacity:
+            block = block[:, -self.capacity:]
+            self.overruns += n - self.capacity
+            self.head += n - self.capacity
+            n = self.capacity
+
+        idx = np.arange(self.head, self.head + n) % self.capacity
+        self._buf[:, idx] = block
+        self.head += n
+
+        if self.depth > self.capacity:
+            self.overruns += self.depth - self.capacity
+            self.tail = self.head - self.capacity
+
+    def skip(self):
+        """
+        Drop all unread samples (e.g. after a gap in the stream); returns
+        how many were dropped.
+        """
+        n = self.depth
+        self.tail = self.head
+        return n
+
+    def read_window(self, window, hop):
+        """
+        Copy of the next window and its end index, advancing by hop;
+        None while fewer than window samples are buffered.
+        """
+        if self.depth < window:
+            return None
+        idx = np.arange(self.tail, self.tail + window) % self.capacity
+        out = self._buf[:, idx]
+        self.tail += hop
+        return out, self.tail - hop + window
+
+
+def estimate_window(x, Fs, f, positions, bw=2000, n_bins=5):
+    """
+    (delta_t, theta_deg) of one (M, window) block. delta_t is the sensor 1
+    to 2 TDOA; with more than two channels theta comes from the
+    least-squares array fit.
+    """
+    xf = bandpass_filter(np.asarray(x, dtype=np.float64), Fs, f, bw)
+    delta_t = estimate_tdoa_phase(xf[0], xf[1], Fs, f, n_bins)
+    if len(positions) == 2:
+        theta = tdoa_to_doa(delta_t, positions[1] - positions[0])
+    else:
+        theta = estimate_doa_array(xf, positions, Fs, f, n_bins)
+    return float(delta_t), float(theta)
+
+
+class DOAService:
+    """
+    Receives sample packets and publishes one DOA estimate per window.
+
+    positions are the element positions (m); their count fixes the
+    expected channel count. At most max_pending windows are estimated at
+    once; windows that complete while the executor is saturated are
+    skipped (counted in windows_dropped) rather than queued, so latency
+    stays bounded. Estimates are dicts on the estimates queue, in stream
+    order, whose oldest entry is discarded when nobody is reading.
+    """
+
+    def __init__(self, Fs, f, positions, window=20_000, hop=None, capacity=None,
+                 bw=2000, n_bins=5, max_pending=4, max_estimates=1024, executor=None):
+        self.Fs = Fs
+        self.f = f
+        self.positions = np.asarray(positions, dtype=float)
+        self.window = window
+        self.hop = window if hop is None else hop
+        self.bw = bw
+        self.n_bins = n_bins
+        self.max_pending = max_pending
+        self.executor = executor
+
+        self.ring = SampleRing(len(self.positions), capacity or 8 * window)
+        self.estimates = asyncio.Queue(max_estimates)
+
+        self.packets = 0
+        self.packets_lost = 0
+        self.packets_late = 0
+        self.bad_packets = 0
+        self.gaps = 0
+        self.samples_discarded = 0
+        self.windows_dropped = 0
+        self.pending = 0
+        self._next_seq = None
+        self._next_index = None       # expected sample_index of the next packet
+        self._index_offset = 0        # stream index minus ring index
+        self._sent_times = deque()    # (ring end index, t_sent) of recent packets
+        self._tasks = set()
+        self._last_publish = None     # publish task of the latest window
+
+    def metrics(self):
+        return {
+            "packets": self.packets,
+            "packets_lost": self.packets_lost,
+            "packets_late": self.packets_late,
+            "bad_packets": self.bad_packets,
+            "gaps": self.gaps,
+            "samples_discarded": self.samples_discarded,
+            "ring_depth": self.ring.depth,
+            "ring_overruns": self.ring.overruns,
+            "pending": self.pending,
+            "windows_dropped": self.windows_dropped,
+            "estimates_queued": self.estimates.qsize(),
+        }
+
+    def feed(self, data):
+        """
+        Handle one raw packet.
+        """
+        try:
+            seq, sample_index, block, t_sent = unpack_packet(data)
+            if block.shape[0] != self.ring._buf.shape[0]:
+                raise ValueError("unexpected channel count")
+        except (struct.error, ValueError):
+            self.bad_packets += 1
+            return
+
+        if self._next_index is None:
+            self._index_offset = sample_index - self.ring.head
+        elif sample_index < self._next_index:
+            # Reordered or duplicated datagram; its samples are already past.
+            self.packets_late += 1
+            return
+        elif sample_index > self._next_index:
+            # Samples are missing: drop the partial windows before the gap
+            # and continue the ring at the new stream position.
+            self.gaps += 1
+            self.samples_discarded += self.ring.skip()
+            self._index_offset = sample_index - self.ring.head
+        self._next_index = sample_index + block.shape[1]
+
+        self.packets += 1
+        if self._next_seq is not None and seq != self._next_seq:
+            self.packets_lost += (seq - self._next_seq) % (1 << 32)
+        self._next_seq = (seq + 1) % (1 << 32)
+
+        self.ring.write(block)
+        self._sent_times.append((self.ring.head, t_sent))
+
+        while True:
+            item = self.ring.read_window(self.window, self.hop)
+            if item is None:
+                break
+            x, end = item
+            if self.pending >= self.max_pending:
+                self.windows_dropped += 1
+                continue
+            self._submit(x, end + self._index_offset, self._sent_time(end))
+
+    def _sent_time(self, end):
+        # Sender time of the packet holding the window's last sample.
+        while len(self._sent_times) > 1 and self._sent_times[0][0] < end:
+            self._sent_times.popleft()
+        return self._sent_times[0][1]
+
+    def _submit(self, x, end, t_sent):
+        # end is the stream index (sender's sample_index) after the window.
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        fut = loop.run_in_executor(
+            self.executor, estimate_window,
+            x, self.Fs, self.f, self.positions, self.bw, self.n_bins,
+        )
+        task = asyncio.ensure_future(self._publish(fut, end, t_sent, self._last_publish))
+        self._last_publish = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _publish(self, fut, end, t_sent, previous):
+        # Windows may finish out of order on the executor; each one waits
+        # for the previous window's publish, so estimates stay in stream
+        # order.
+        try:
+            delta_t, theta = await fut
+        finally:
+            self.pending -= 1
+        if previous is not None:
+            await asyncio.wait([previous])
+        t_done = time.time()
+        estimate = {
+            "sample_index": end,
+            "time": end / self.Fs,
+            "delta_t": delta_t,
+            "theta_est": theta,
+            "t_sent": t_sent,
+            "t_done": t_done,
+            "latency": t_done - t_sent,
+            **self.metrics(),
+        }
+        if self.estimates.full():
+            self.estimates.get_nowait()
+        self.estimates.put_nowait(estimate)
+
+    async def drain(self):
+        """
+        Wait for all in-flight estimates to be published.
+        """
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+
+    async def serve_udp(self, host="127.0.0.1", port=9999):
+        loop = asyncio.get_running_loop()
+        service = self
+
+        class _Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                service.feed(data)
+
+        transport, _ = await loop.create_datagram_endpoint(
+            _Protocol, local_addr=(host, port)
+        )
+        return transport
+
+    async def serve_tcp(self, host="127.0.0.1", port=9999):
+        async def handle(reader, writer):
+            try:
+                while True:
+                    header = await reader.readexactly(PACKET_HEADER.size)
+                    _, _, M, n, _ = PACKET_HEADER.unpack(header)
+                    payload = await reader.readexactly(4 * M * n)
+                    self.feed(header + payload)
+            except asyncio.IncompleteReadError:
+                pass
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+
+async def simulate_stream(host, port, Fs, f, theta_deg, positions, noise_sigma, T,
+                          packet=1024, rate=1.0, protocol="udp", seed=None):
+    """
+    Replay a generate_array_signals capture as packets to a DOAService.
+
+    Packets are paced at rate times real time (rate=0 sends as fast as
+    possible). Over UDP, packet is capped at max_udp_packet(M) so every
+    datagram fits. Returns the number of packets sent.
+    """
+    if protocol == "udp":
+        packet = min(packet, max_udp_packet(len(positions)))
+        if packet < 1:
+            raise ValueError("too many channels for one UDP datagram")
+
+    t = generate_time_axis(Fs, T)
+    X, _ = generate_array_signals(t, f, theta_deg, positions, noise_sigma,
+                                  dtype=np.float32, rng=seed)
+
+    loop = asyncio.get_running_loop()
+    if protocol == "udp":
+        transport, _ = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, remote_addr=(host, port)
+        )
+        send = transport.sendto
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+        send = writer.write
+
+    t0 = time.perf_counter()
+    seq = 0
+    for start in range(0, X.shape[1], packet):
+        block = X[:, start:start + packet]
+        if rate > 0:
+            due = t0 + (start + block.shape[1]) / (Fs * rate)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        send(pack_packet(seq, start, block, time.time()))
+        if protocol == "tcp":
+            await writer.drain()
+        else:
+            await asyncio.sleep(0)
+        seq += 1
+
+    if protocol == "udp":
+        transport.close()
+    else:
+        writer.close()
+        await writer.wait_closed()
+    return seq
+
+
+async def _print_estimates(service):
+    while True:
+        e = await service.estimates.get()
+        print(f"{e['time']:9.3f} s  theta={e['theta_est']:7.2f} deg  "
+              f"latency={1e3 * e['latency']:6.1f} ms  depth={e['ring_depth']}  "
+              f"pending={e['pending']}  dropped={e['windows_dropped']}")
+
+
+async def _serve(args):
+    positions = np.arange(args.channels) * args.d
+    service = DOAService(args.Fs, args.f, positions, args.window, args.hop)
+    if args.protocol == "udp":
+        await service.serve_udp(args.host, args.port)
+    else:
+        await service.serve_tcp(args.host, args.port)
+    await _print_estimates(service)
+
+
+async def _simulate(args):
+    positions = np.arange(args.channels) * args.d
+    n = await simulate_stream(args.host, args.port, args.Fs, args.f, args.theta,
+                              positions, args.noise, args.T, args.packet,
+                              args.rate, args.protocol, args.seed)
+    print(f"sent {n} packets")
+
+
+async def _loadtest(args):
+    positions = np.arange(args.channels) * args.d
+    service = DOAService(args.Fs, args.f, positions, args.window, args.hop)
+    if args.protocol == "udp":
+        server = await service.serve_udp(args.host, args.port)
+    else:
+        server = await service.serve_tcp(args.host, args.port)
+
+    t0 = time.perf_counter()
+    await simulate_stream(args.host, args.port, args.Fs, args.f, args.theta,
+                          positions, args.noise, args.T, args.packet,
+                          args.rate, args.protocol, args.seed)
+    await asyncio.sleep(0.05)
+    await service.drain()
+    elapsed = time.perf_counter() - t0
+    server.close()
+
+    results = []
+    while not service.estimates.empty():
+        results.append(service.estimates.get_nowait())
+    latency = np.array([e["latency"] for e in results]) * 1e3
+    theta = np.array([e["theta_est"] for e in results])
+
+    m = service.metrics()
+    print(f"{m['packets']} packets ({m['packets_lost']} lost), {len(results)} estimates "
+          f"in {elapsed:.2f} s = {service.ring.head / elapsed / 1e3:.0f} ksamples/s")
+    print(f"windows dropped {m['windows_dropped']}, ring overruns {m['ring_overruns']}")
+    if len(results):
+        print(f"latency ms: p50 {np.percentile(latency, 50):.1f}  "
+              f"p95 {np.percentile(latency, 95):.1f}  max {latency.max():.1f}")
+        print(f"theta: mean {theta.mean():.2f} deg, std {theta.std():.3f} deg")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Real-time DOA ingestion service")
+    parser.add_argument("command", choices=["serve", "simulate", "loadtest"])
+    parser.add_argument("--protocol", choices=["udp", "tcp"], default="udp")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--Fs", type=float, default=100_000)
+    parser.add_argument("--f", type=float, default=30_000)
+    parser.add_argument("--d", type=float, default=0.02)
+    parser.add_argument("--window", type=int, default=20_000, help="samples per estimate")
+    parser.add_argument("--hop", type=int, help="samples between estimates (default: window)")
+    parser.add_argument("--theta", type=float, default=30.0, help="simulated source angle (deg)")
+    parser.add_argument("--noise", type=float, default=0.01, help="simulated noise sigma")
+    parser.add_argument("--T", type=float, default=2.0, help="simulated duration (s)")
+    parser.add_argument("--packet", type=int, default=1024, help="samples per packet")
+    parser.add_argument("--rate", type=float, default=1.0,
+                        help="real-time factor of the simulator (0: unpaced)")
+    parser.add_argument("--seed", type=int)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run = {"serve": _serve, "simulate": _simulate, "loadtest": _loadtest}[args.command]
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,73 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.io import wavfile
+
+from doa_algorithm import bandpass_filter, downconvert, estimate_tdoa_phase, tdoa_to_doa
+
+
+def open_wav(path):
+    """
+    Memory-map a multi-channel WAV file.
+    Returns (Fs, data) with data a read-only (frames, channels) view.
+    """
+    Fs, data = wavfile.read(path, mmap=True)
+    if data.ndim == 1:
+        data = data[:, None]
+    return Fs, data
+
+
+def open_raw(path, n_channels, dtype="int16", offset=0):
+    """
+    Memory-map a headerless interleaved binary recording (e.g. int16 or
+    float32 samples, channel-interleaved) as a (frames, channels) view.
+    A trailing partial frame is ignored.
+    """
+    raw = np.memmap(path, dtype=dtype, mode="r", offset=offset)
+    n_frames = len(raw) // n_channels
+    return raw[:n_frames * n_channels].reshape(n_frames, n_channels)
+
+
+def doa_time_series(data, Fs, f, d, window=20_000, hop=None, channels=(0, 1),
+                    bw=2000, n_bins=5, batch=32, dtype=np.float64, decim=None):
+    """
+    Per-window DOA of a (frames, channels) recording, e.g. from open_wav
+    or open_raw.
+
+    Windows are taken as strided views of the mapped file and processed
+    batch windows at a time through bandpass_filter and
+    estimate_tdoa_phase, so memory stays O(batch * window) whatever the
+    file size. With decim set, the band-pass is replaced by the complex
+    baseband front end (downconvert) and estimation runs at Fs / decim.
+
+    Returns a dict with the window centre times (s), delta_t and theta.
+    """
+    hop = window if hop is None else hop
+    if data.shape[0] < window:
+        raise ValueError("recording is shorter than one window")
+
+    # (n_windows, channels, window) view; nothing is read yet.
+    views = sliding_window_view(data, window, axis=0)[::hop]
+    n_windows = views.shape[0]
+    channels = list(channels)
+
+    delta_t = np.empty(n_windows)
+    for start in range(0, n_windows, batch):
+        block = np.asarray(views[start:start + batch, channels], dtype=dtype)
+        if decim is None:
+            block = bandpass_filter(block, Fs, f, bw)
+            delta_t[start:start + len(block)] = estimate_tdoa_phase(
+                block[:, 0], block[:, 1], Fs, f, n_bins
+            )
+        else:
+            z, Fs_out = downconvert(block, Fs, f, decim, bw)
+            delta_t[start:start + len(block)] = estimate_tdoa_phase(
+                z[:, 0], z[:, 1], Fs_out, f, n_bins, f_lo=f
+            )
+
+    time = (np.arange(n_windows) * hop + window / 2) / Fs
+
+    return {
+        "time": time,
+        "delta_t": delta_t,
+        "theta": tdoa_to_doa(delta_t, d),
+    }
@@ -0,0 +1,296 @@
+"""
+Content-addressed cache of pipeline results.
+
+Entries are keyed by a SHA-256 of the run parameters (theta, noise sigma,
+d, T, Fs, f, filter settings, seed) and ALGORITHM_VERSION, so a change to
+the estimator invalidates old entries by simply no longer matching them.
+Only runs with a reproducible seed are cached.
+
+Two tiers: an in-process LRU of recent entries bounded by max_memory_bytes,
+and a directory of .npz files shared by every process (Streamlit app, CLI,
+batch workers) that is trimmed to max_bytes, least recently used first.
+An entry larger than a quarter of a tier's limit is not stored in that
+tier, so one long capture cannot flush everything else. The directory defaults to
+~/.cache/doa-lab and can be moved with the DOA_CACHE_DIR environment
+variable.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from pipeline import ALGORITHM_VERSION, DOAResult
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "doa-lab")
+
+# Writes between full rescans of the disk tier, and the fraction of
+# max_bytes an eviction trims down to.
+_RESCAN_WRITES = 256
+_EVICT_TO = 0.9
+
+# Largest entry a tier accepts, as a fraction of its byte limit.
+_MAX_ENTRY = 0.25
+
+# Arrays of a full DOAResult that are stored; t and freqs come from the pipeline.
+_FULL_FIELDS = ("x", "xf", "X", "Xf")
+
+
+def seed_key(seed):
+    """
+    JSON-able identity of a seed: an int, or a SeedSequence's entropy and
+    spawn key. None for seeds that do not reproduce (None, Generators).
+    """
+    if isinstance(seed, (int, np.integer)) and not isinstance(seed, bool):
+        return int(seed)
+    if isinstance(seed, np.random.SeedSequence):
+        return [str(seed.entropy), list(seed.spawn_key), seed.pool_size]
+    return None
+
+
+def cache_key(**params):
+    """
+    Hex digest of params plus ALGORITHM_VERSION.
+    """
+    params = dict(params, algorithm_version=ALGORITHM_VERSION)
+    text = json.dumps(params, sort_keys=True, default=float)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier (memory LRU + on-disk .npz) store of dicts of arrays.
+
+    path=None keeps only the memory tier. Values are stored and returned
+    as read-only copies; the memory tier holds at most max_memory_bytes
+    of arrays and max_items entries. One instance may be shared between threads (e.g.
+    Streamlit sessions); the memory tier is guarded by a lock.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_DIR, max_bytes=256 * 2**20, max_items=32,
+                 max_memory_bytes=128 * 2**20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.max_memory_bytes = max_memory_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        # Running estimate of the disk tier size, so put() does not walk the
+        # directory; None until the first write scans it.
+        self._disk_bytes = None
+        self._writes_since_scan = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key + ".npz")
+
+    def _remember(self, key, value, nbytes):
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= _nbytes(old)
+            self._memory[key] = value
+            self._memory_bytes += nbytes
+            while (len(self._memory) > self.max_items
+                   or self._memory_bytes > self.max_memory_bytes):
+                _, dropped = self._memory.popitem(last=False)
+                self._memory_bytes -= _nbytes(dropped)
+
+    def get(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return value
+
+        if self.path is not None:
+            try:
+                with np.load(self._file(key)) as npz:
+                    value = {name: npz[name] for name in npz.files}
+                os.utime(self._file(key))
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                for arr in value.values():
+                    arr.flags.writeable = False
+                nbytes = _nbytes(value)
+                if nbytes <= self.max_memory_bytes * _MAX_ENTRY:
+                    self._remember(key, value, nbytes)
+                with self._lock:
+                    self.hits_disk += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        value = {name: np.asarray(arr) for name, arr in value.items()}
+        nbytes = _nbytes(value)
+        if nbytes <= self.max_memory_bytes * _MAX_ENTRY:
+            # Copy, so the caller keeps its (writable) arrays and cannot
+            # alter the cached ones through them.
+            kept = {name: np.array(arr) for name, arr in value.items()}
+            for arr in kept.values():
+                arr.flags.writeable = False
+            self._remember(key, kept, nbytes)
+        # .npz files are uncompressed, so nbytes is about the file size.
+        if self.path is None or nbytes > self.max_bytes * _MAX_ENTRY:
+            return
+
+        # Write to a temp file and rename, so concurrent readers and
+        # writers of the same key never see a partial file.
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.savez(fh, **value)
+            size = os.path.getsize(tmp)
+            try:
+                size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+
+        if self._disk_bytes is None:
+            self._disk_bytes = self.disk_bytes()
+        else:
+            self._disk_bytes += size
+        self._writes_since_scan += 1
+        # Other processes write to the same directory, so the running total
+        # is only an estimate: rescan when it passes the limit, and every
+        # _RESCAN_WRITES writes.
+        if self._disk_bytes > self.max_bytes or self._writes_since_scan >= _RESCAN_WRITES:
+            self._evict()
+
+    def _entries(self):
+        entries = []
+        for sub in os.scandir(self.path):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".npz"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        # Trim to _EVICT_TO of max_bytes, so a full cache does not rescan on
+        # every following write.
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * _EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+        self._disk_bytes = total
+        self._writes_since_scan = 0
+
+    def disk_bytes(self):
+        if self.path is None or not os.path.isdir(self.path):
+            return 0
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        self._disk_bytes = None
+        if self.path is not None and os.path.isdir(self.path):
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "memory_items": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_bytes": self.disk_bytes(),
+        }
+
+
+def _nbytes(value):
+    return sum(arr.nbytes for arr in value.values())
+
+
+_default = {}
+
+
+def default_cache(path=None):
+    """
+    Process-wide ResultCache for path (default: DOA_CACHE_DIR or
+    ~/.cache/doa-lab).
+    """
+    path = path or os.environ.get("DOA_CACHE_DIR", DEFAULT_CACHE_DIR)
+    if path not in _default:
+        _default[path] = ResultCache(path)
+    return _default[path]
+
+
+def run_cached(pipeline, theta_deg, noise_sigma, seed, cache=None, full=True):
+    """
+    pipeline.run(theta_deg, noise_sigma, rng=seed) through cache.
+
+    full=False caches only delta_t / theta_est / tau (enough for sweeps);
+    the returned DOAResult then has None for the signal and spectrum
+    fields. Runs whose seed does not reproduce are never cached.
+    """
+    key_seed = seed_key(seed)
+    if cache is None or key_seed is None:
+        return pipeline.run(theta_deg, noise_sigma, rng=seed)
+
+    key = cache_key(
+        kind="doa_result" if full else "doa_estimate",
+        theta=float(theta_deg), noise_sigma=float(noise_sigma),
+        Fs=pipeline.Fs, T=pipeline.T, f=pipeline.f, d=pipeline.d,
+        bw=pipeline.bw, n_bins=pipeline.n_bins, dtype=pipeline.dtype.str,
+        decim=pipeline.decim, seed=key_seed,
+    )
+
+    value = cache.get(key)
+    if value is None:
+        result = pipeline.run(theta_deg, noise_sigma, rng=seed)
+        value = {
+            "delta_t": result.delta_t,
+            "theta_est": result.theta_est,
+            "tau": result.tau,
+        }
+        if full:
+            # xf / X / Xf are None for a decimating pipeline.
+            value.update({name: getattr(result, name) for name in _FULL_FIELDS
+                          if getattr(result, name) is not None})
+        cache.put(key, value)
+        return result
+
+    arrays = {name: value.get(name) for name in _FULL_FIELDS}
+    return DOAResult(
+        pipeline.t, arrays["x"], arrays["xf"], pipeline.freqs, arrays["X"], arrays["Xf"],
+        float(value["delta_t"]), float(value["theta_est"]), float(value["tau"]),
+    )
@@ -1,33 +1,39 @@
 import streamlit as st
-import numpy as np
-import matplotlib.pyplot as plt
-
-from signal_model import generate_time_axis, generate_signals
-from doa_algorithm import bandpass_filter, estimate_tdoa_phase, tdoa_to_doa
-
-st.markdown(
-    """
-    <style>
-    .doa-result {
-        background-color: #f7f7f7;
-        color: #000000;
-        padding: 15px;
-        border-left: 5px solid #1f77b4;
-        font-size: 18px;
-        margin-top: 10px;
-    }
-
-    @media (prefers-color-scheme: dark) {
+
+from contextlib import nullcontext
+
+from profiling import profile_stages, stage
+
+# numpy, plotly and the pipeline (scipy.signal) are imported inside the
+# functions that use them, so opening the app or this page without running
+# a simulation does not pay for them.
+
+
+def inject_styles():
+    st.markdown(
+        """
+        <style>
         .doa-result {
-            background-color: #1e2a38;
-            color: #eaeaea;
-            border-left: 5px solid #4da3ff;
+            background-color: #f7f7f7;
+            color: #000000;
+            padding: 15px;
+            border-left: 5px solid #1f77b4;
+            font-size: 18px;
+            margin-top: 10px;
         }
-    }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+
+        @media (prefers-color-scheme: dark) {
+            .doa-result {
+                background-color: #1e2a38;
+                color: #eaeaea;
+                border-left: 5px solid #4da3ff;
+            }
+        }
+        </style>
+        """,
+        unsafe_allow_html=True,
+    )
+
 
 def obs_box(text):
     st.markdown(
@@ -62,7 +68,36 @@ def obs_box(text):
 
 
 
+def show_figure(fig, name):
+    with stage(f"render: {name}"):
+        st.plotly_chart(fig, width="stretch")
+
+
+def render_stage_timings(prof):
+    with st.expander("Stage timings"):
+        st.table([
+            {
+                "Stage": name,
+                "Calls": s["calls"],
+                "Wall (ms)": f"{s['wall_s'] * 1e3:.1f}",
+                "CPU (ms)": f"{s['cpu_s'] * 1e3:.1f}",
+                **({"Peak alloc (MiB)": f"{s['peak_bytes'] / 2**20:.2f}"}
+                   if prof.trace_memory else {}),
+            }
+            for name, s in prof.summary().items()
+        ])
+
+
+@st.cache_resource
+def get_pipeline(Fs, T, f, d):
+    from pipeline import DOAPipeline
+
+    # Axes, filter design and carrier bins are reused across reruns.
+    return DOAPipeline(Fs, T, f, d)
+
+
 def render_simulation():
+    inject_styles()
     st.markdown('<div class="main-title">Simulation</div>', unsafe_allow_html=True)
 
     # ---------------- STEP 1 ----------------
@@ -99,6 +134,19 @@ def render_simulation():
     with st.expander("Advanced Settings"):
         d = st.number_input("Sensor spacing d (m)", value=0.02)
         T = st.number_input("Signal duration T (s)", value=0.2)
+        seed = st.number_input(
+            "Noise seed", min_value=0, value=0, step=1,
+            help="Same inputs and seed reproduce the same noise; such repeats "
+                 "are served from the result cache.",
+        )
+        fresh_noise = st.checkbox("New random noise on every run", value=False)
+        record_timings = st.checkbox("Record stage timings", value=False)
+        # tracemalloc slows every allocation in the process, all sessions
+        # included, so peak allocations are opt-in.
+        trace_memory = record_timings and st.checkbox(
+            "Include peak allocations", value=False,
+            help="Traces memory process-wide while the run is timed.",
+        )
 
         st.latex(r"\Delta t = \frac{d \sin(\theta)}{c}")
 
@@ -119,73 +167,158 @@ def render_simulation():
 
     # ---------------- STEP 3 ----------------
     st.subheader("Run Simulation")
+    mode = st.radio("Mode", ["Single run", "Live"], horizontal=True)
+    if mode == "Live":
+        render_live(theta, noise_sigma, d)
+        return
+
     if st.button("Run Simulation"):
-        Fs = 100_000
-        f = 30_000
-
-        t = generate_time_axis(Fs, T)
-        x1, x2, _ = generate_signals(t, f, theta, d, noise_sigma)
-
-        x1f = bandpass_filter(x1, Fs, f)
-        x2f = bandpass_filter(x2, Fs, f)
-
-        delta_t = estimate_tdoa_phase(x1f, x2f, Fs, f)
-        theta_est = tdoa_to_doa(delta_t, d)
-
-        # -------- TIME DOMAIN --------
-        fig1, ax1 = plt.subplots(figsize=(7, 3))
-        ax1.plot(t[:1500], x1[:1500], label="Sensor 1")
-        ax1.plot(t[:1500], x2[:1500], label="Sensor 2")
-        ax1.set_title("Time-Domain Signals")
-        ax1.legend()
-        st.pyplot(fig1)
-        obs_box("Time delay is extremely small and not visually apparent.")
-
-        # -------- FREQ DOMAIN (RAW) --------
-        freqs = np.fft.fftfreq(len(x1), 1/Fs)
-        X1 = np.fft.fft(x1)
-        X2 = np.fft.fft(x2)
-
-        fig2, ax2 = plt.subplots(figsize=(7, 3))
-        ax2.plot(freqs[:len(freqs)//2], 20*np.log10(np.abs(X1[:len(X1)//2])+1e-12), label="Sensor 1")
-        ax2.plot(freqs[:len(freqs)//2], 20*np.log10(np.abs(X2[:len(X2)//2])+1e-12), label="Sensor 2")
-        ax2.set_title("Frequency-Domain (Before Filtering)")
-        ax2.legend()
-        st.pyplot(fig2)
-        obs_box("Signal appears as a narrowband peak; noise is broadband.")
-        # -------- TIME DOMAIN (FILTERED) --------
-        fig_td_filt, ax_td_filt = plt.subplots(figsize=(7, 3))
-        ax_td_filt.plot(t[:1500], x1f[:1500], label="Sensor 1 (filtered)")
-        ax_td_filt.plot(t[:1500], x2f[:1500], label="Sensor 2 (filtered)")
-        ax_td_filt.set_title("Filtered Time-Domain Signals")
-        ax_td_filt.legend()
-        st.pyplot(fig_td_filt)
+        with (profile_stages(trace_memory) if record_timings else nullcontext()) as prof:
+            run_simulation(theta, noise_sigma, d, T, None if fresh_noise else int(seed))
+        if prof is not None:
+            render_stage_timings(prof)
 
-        obs_box(
-            "After band-pass filtering, noise is reduced but the time delay is still "
-            "too small to observe directly in the time domain."
-        )
-        # -------- FREQ DOMAIN (FILTERED) --------
-        X1f = np.fft.fft(x1f)
-        X2f = np.fft.fft(x2f)
 
-        fig3, ax3 = plt.subplots(figsize=(7, 3))
-        ax3.plot(freqs[:len(freqs)//2], 20*np.log10(np.abs(X1f[:len(X1f)//2])+1e-12), label="Sensor 1 (filtered)")
-        ax3.plot(freqs[:len(freqs)//2], 20*np.log10(np.abs(X2f[:len(X2f)//2])+1e-12), label="Sensor 2 (filtered)")
-        ax3.set_title("Frequency-Domain (After Filtering)")
-        ax3.legend()
-        st.pyplot(fig3)
-        obs_box("Filtering suppresses broadband noise outside the signal band.")
+# Live readout refresh period (s); bounds how often the fragment reruns.
+LIVE_REFRESH_S = 0.5
 
-        st.subheader("Estimated Direction of Arrival")
 
-        st.markdown(
-            f"""
-            <div class="doa-result">
-                <b>Given Source Angle:</b> {theta:.2f}° <br>
-                <b>Estimated DOA:</b> {theta_est:.2f}°
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
+def render_live(theta, noise_sigma, d):
+    from live import LiveSession
+
+    st.markdown(
+        """
+        <div class="section-text">
+        A continuous sensor stream is estimated frame by frame in the
+        background. Move the sliders to watch the estimate follow the source;
+        changes take effect once a slider has been still for half a second.
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    session = st.session_state.get("live_session")
+    start_col, stop_col = st.columns(2)
+    if start_col.button("Start live"):
+        if session is None:
+            session = LiveSession(theta, noise_sigma, d)
+            st.session_state["live_session"] = session
+        session.start()
+    if stop_col.button("Stop live") and session is not None:
+        session.stop()
+
+    if session is None:
+        return
+    session.update(theta, noise_sigma, d)
+    live_readout()
+
+
+@st.fragment(run_every=LIVE_REFRESH_S)
+def live_readout():
+    # Only this fragment reruns on the timer; the rest of the page is untouched.
+    import plotly.graph_objects as go
+
+    session = st.session_state.get("live_session")
+    if session is None:
+        return
+    snap = session.snapshot()
+
+    status = "running" if snap["running"] else "stopped"
+    if snap["pending"]:
+        status += ", applying new parameters"
+    latest = "–" if snap["latest"] is None else f"{snap['latest']:.2f}°"
+    st.markdown(
+        f"""
+        <div class="doa-result">
+            <b>Given Source Angle:</b> {snap['theta']:.2f}° <br>
+            <b>Estimated DOA:</b> {latest} <br>
+            <small>Stream time {snap['stream_time']:.1f} s ({status})</small>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=snap["time"], y=snap["theta_true"], mode="lines",
+                             name="True angle", line=dict(dash="dash", shape="hv")))
+    fig.add_trace(go.Scatter(x=snap["time"], y=snap["theta_est"], mode="lines",
+                             name="Estimated DOA"))
+    fig.update_layout(title="Estimate History", xaxis_title="Stream time (s)",
+                      yaxis_title="Angle (deg)", height=320,
+                      margin=dict(l=40, r=20, t=50, b=40))
+    st.plotly_chart(fig, width="stretch")
+
+
+def run_simulation(theta, noise_sigma, d, T, seed=None):
+    from adaptive import estimate_doa_adaptive
+    from plotting import spectrum_figure, time_figure
+    from result_cache import default_cache, run_cached
+
+    Fs = 100_000
+    f = 30_000
 
+    result = run_cached(get_pipeline(Fs, T, f, d), theta, noise_sigma, seed, default_cache())
+    t = result.t
+    x1, x2 = result.x
+    x1f, x2f = result.xf
+    theta_est = result.theta_est
+
+    # Figures are min-max decimated to screen resolution; the first 1500
+    # samples and the band around f are kept at full resolution.
+    t_end = t[min(1500, len(t)) - 1]
+
+    # -------- TIME DOMAIN --------
+    fig1 = time_figure(t, [x1, x2], ["Sensor 1", "Sensor 2"],
+                       "Time-Domain Signals", t_end)
+    show_figure(fig1, "Time-Domain Signals")
+    obs_box("Time delay is extremely small and not visually apparent.")
+
+    # -------- FREQ DOMAIN (RAW) --------
+    freqs = result.freqs
+
+    fig2 = spectrum_figure(freqs, result.X, ["Sensor 1", "Sensor 2"], f,
+                           "Frequency-Domain (Before Filtering)")
+    show_figure(fig2, "Frequency-Domain (Before Filtering)")
+    obs_box("Signal appears as a narrowband peak; noise is broadband.")
+    # -------- TIME DOMAIN (FILTERED) --------
+    fig_td_filt = time_figure(t, [x1f, x2f],
+                              ["Sensor 1 (filtered)", "Sensor 2 (filtered)"],
+                              "Filtered Time-Domain Signals", t_end)
+    show_figure(fig_td_filt, "Filtered Time-Domain Signals")
+
+    obs_box(
+        "After band-pass filtering, noise is reduced but the time delay is still "
+        "too small to observe directly in the time domain."
+    )
+    # -------- FREQ DOMAIN (FILTERED) --------
+    fig3 = spectrum_figure(freqs, result.Xf,
+                           ["Sensor 1 (filtered)", "Sensor 2 (filtered)"], f,
+                           "Frequency-Domain (After Filtering)")
+    show_figure(fig3, "Frequency-Domain (After Filtering)")
+    obs_box("Filtering suppresses broadband noise outside the signal band.")
+
+    st.subheader("Estimated Direction of Arrival")
+
+    st.markdown(
+        f"""
+        <div class="doa-result">
+            <b>Given Source Angle:</b> {theta:.2f}° <br>
+            <b>Estimated DOA:</b> {theta_est:.2f}°
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    adaptive = estimate_doa_adaptive(x1, x2, Fs, f, d)
+    if adaptive.converged:
+        obs_box(
+            f"An adaptive estimator that stops once it is confident to "
+            f"±0.1° reaches {adaptive.theta_est:.2f}° ± {adaptive.std_deg:.3f}° "
+            f"after {adaptive.t_used * 1e3:.0f} ms of the {T * 1e3:.0f} ms signal."
+        )
+    else:
+        obs_box(
+            f"Even the full {T * 1e3:.0f} ms signal only pins the angle down to "
+            f"±{adaptive.std_deg:.3f}° ({adaptive.theta_est:.2f}°); lower noise "
+            f"or a longer signal is needed for ±0.1°."
+        )
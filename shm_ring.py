@@ -0,0 +1,351 @@
+"""
+Zero-copy block ring on multiprocessing.shared_memory.
+
+One producer writes fixed-size (M, block_len) sample blocks; consumers in
+other processes attach by name and run estimation directly on views of the
+shared slots, so no samples are pickled or copied between processes.
+
+Each slot carries a seqlock stamp: 2k+1 while block k is being written,
+2k+2 once it is complete. A consumer checks the stamp before and after
+using a view, so a block overwritten mid-use is detected (torn) instead
+of silently giving a mixed-up estimate. Consumers that fall more than
+n_slots blocks behind skip ahead and count the lost blocks as overruns.
+
+By default the producer waits for the slowest consumer instead of
+overwriting (backpressure); the number and total time of those waits are
+kept in the shared stats.
+"""
+
+import argparse
+import sys
+import time
+from multiprocessing import Process, shared_memory
+
+import numpy as np
+
+from doa_algorithm import bandpass_filter, estimate_tdoa_phase, tdoa_to_doa
+
+# Control words (int64)
+_N_CHANNELS, _BLOCK_LEN, _N_SLOTS, _MAX_CONSUMERS, _ITEMSIZE = 0, 1, 2, 3, 4
+_WRITTEN, _WAITS, _WAIT_NS, _CLOSED = 5, 6, 7, 8
+_N_CTRL = 16
+
+# Per-consumer words (int64)
+_ACTIVE, _CURSOR, _STRIDE, _DONE, _OVERRUNS, _TORN = range(6)
+_N_CONSUMER = 8
+
+# Per-slot metadata (int64)
+_STAMP, _SAMPLE_INDEX, _N_VALID, _T_NS = range(4)
+_N_META = 4
+
+_DTYPES = {4: np.float32, 8: np.float64}
+
+
+class ShmRing:
+    """
+    Fixed-slot sample block ring in one shared memory segment.
+
+    Create it in the producer with ShmRing.create(); other processes call
+    ShmRing.attach(name). The creator unlinks the segment on close().
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+
+        ctrl = np.ndarray((_N_CTRL,), dtype=np.int64, buffer=shm.buf)
+        M, L, S, C, itemsize = (int(v) for v in ctrl[:_ITEMSIZE + 1])
+        self.n_channels, self.block_len, self.n_slots, self.max_consumers = M, L, S, C
+        self.dtype = np.dtype(_DTYPES[itemsize])
+
+        offset = ctrl.nbytes
+        self._ctrl = ctrl
+        self._consumers = np.ndarray((C, _N_CONSUMER), dtype=np.int64,
+                                     buffer=shm.buf, offset=offset)
+        offset += self._consumers.nbytes
+        self._meta = np.ndarray((S, _N_META), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self._meta.nbytes
+        self._data = np.ndarray((S, M, L), dtype=self.dtype, buffer=shm.buf, offset=offset)
+
+    @staticmethod
+    def _nbytes(n_channels, block_len, n_slots, max_consumers, dtype):
+        return 8 * (_N_CTRL + max_consumers * _N_CONSUMER + n_slots * _N_META) \
+            + n_slots * n_channels * block_len * np.dtype(dtype).itemsize
+
+    @classmethod
+    def create(cls, n_channels, block_len, n_slots=32, max_consumers=8,
+               dtype=np.float64, name=None):
+        dtype = np.dtype(dtype)
+        if dtype.itemsize not in _DTYPES:
+            raise ValueError("dtype must be float32 or float64")
+        size = cls._nbytes(n_channels, block_len, n_slots, max_consumers, dtype)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        ctrl = np.ndarray((_N_CTRL,), dtype=np.int64, buffer=shm.buf)
+        ctrl[:] = 0
+        ctrl[:_ITEMSIZE + 1] = (n_channels, block_len, n_slots, max_consumers, dtype.itemsize)
+        ring = cls(shm, owner=True)
+        ring._consumers[:] = 0
+        ring._meta[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        # Drop our views before releasing the buffer.
+        del self._ctrl, self._consumers, self._meta, self._data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------- producer ---------------- #
+
+    def _min_cursor(self):
+        active = self._consumers[:, _ACTIVE] != 0
+        if not active.any():
+            return None
+        return int(self._consumers[active, _CURSOR].min())
+
+    def write(self, block, sample_index=0, wait=True, timeout=None, poll=1e-4):
+        """
+        Copy an (M, n <= block_len) block into the next slot and publish it.
+
+        With wait=True, waits while the slot still holds a block some
+        active consumer has not released (backpressure); returns False on
+        timeout. With wait=False the slot is overwritten regardless and
+        slow consumers see overruns.
+        """
+        k = int(self._ctrl[_WRITTEN])
+        if wait:
+            t0 = time.perf_counter_ns()
+            waited = False
+            while True:
+                lo = self._min_cursor()
+                if lo is None or k - lo < self.n_slots:
+                    break
+                waited = True
+                if timeout is not None and time.perf_counter_ns() - t0 > timeout * 1e9:
+                    self._ctrl[_WAIT_NS] += time.perf_counter_ns() - t0
+                    self._ctrl[_WAITS] += 1
+                    return False
+                time.sleep(poll)
+            if waited:
+                self._ctrl[_WAITS] += 1
+                self._ctrl[_WAIT_NS] += time.perf_counter_ns() - t0
+
+        block = np.asarray(block)
+        n = block.shape[1]
+        slot = k % self.n_slots
+        meta = self._meta[slot]
+
+        meta[_STAMP] = 2 * k + 1
+        self._data[slot, :, :n] = block
+        meta[_SAMPLE_INDEX] = sample_index
+        meta[_N_VALID] = n
+        meta[_T_NS] = time.time_ns()
+        meta[_STAMP] = 2 * k + 2
+
+        self._ctrl[_WRITTEN] = k + 1
+        return True
+
+    def close_stream(self):
+        """
+        Tell consumers no more blocks will be written.
+        """
+        self._ctrl[_CLOSED] = 1
+
+    # ---------------- consumers ---------------- #
+
+    def connect(self, consumer_id, stride=1, offset=None):
+        """
+        Register a consumer slot. With stride > 1 the consumer only takes
+        blocks k with k % stride == offset (default: consumer_id % stride),
+        so stride consumers split the stream between them.
+        """
+        if offset is None:
+            offset = consumer_id % stride
+        start = int(self._ctrl[_WRITTEN])
+        start += (offset - start) % stride
+        c = self._consumers[consumer_id]
+        c[:] = 0
+        c[_CURSOR] = start
+        c[_STRIDE] = stride
+        c[_ACTIVE] = 1
+
+    def n_connected(self):
+        return int((self._consumers[:, _ACTIVE] != 0).sum())
+
+    def disconnect(self, consumer_id):
+        self._consumers[consumer_id, _ACTIVE] = 0
+
+    def get(self, consumer_id, timeout=None, poll=1e-4):
+        """
+        Next block for this consumer as (k, view, sample_index, t_ns), or
+        None on timeout or when the stream is closed and drained.
+
+        view is a read-only (M, n) view of the shared slot; it is only
+        valid until release(), which reports whether it stayed intact.
+        """
+        c = self._consumers[consumer_id]
+        stride = int(c[_STRIDE])
+        t0 = time.perf_counter()
+        while True:
+            k = int(c[_CURSOR])
+            written = int(self._ctrl[_WRITTEN])
+
+            if k < written:
+                lag = written - k
+                if lag > self.n_slots:
+                    # Overrun: skip to the oldest block still in the ring.
+                    skip = -(-(lag - self.n_slots) // stride) * stride
+                    c[_OVERRUNS] += skip // stride
+                    c[_CURSOR] = k + skip
+                    continue
+
+                meta = self._meta[k % self.n_slots]
+                if meta[_STAMP] != 2 * k + 2:
+                    # Being overwritten right now.
+                    c[_OVERRUNS] += 1
+                    c[_CURSOR] = k + stride
+                    continue
+
+                view = self._data[k % self.n_slots, :, :int(meta[_N_VALID])]
+                view = view.view()
+                view.flags.writeable = False
+                return k, view, int(meta[_SAMPLE_INDEX]), int(meta[_T_NS])
+
+            if self._ctrl[_CLOSED]:
+                return None
+            if timeout is not None and time.perf_counter() - t0 > timeout:
+                return None
+            time.sleep(poll)
+
+    def release(self, consumer_id, k):
+        """
+        Finish with block k. Returns False if the producer overwrote it
+        while it was in use (the result computed from it is invalid).
+        """
+        c = self._consumers[consumer_id]
+        intact = self._meta[k % self.n_slots, _STAMP] == 2 * k + 2
+        if intact:
+            c[_DONE] += 1
+        else:
+            c[_TORN] += 1
+        c[_CURSOR] = k + int(c[_STRIDE])
+        return bool(intact)
+
+    def stats(self):
+        """
+        Producer and per-consumer counters, including current lag (blocks
+        written but not yet released).
+        """
+        written = int(self._ctrl[_WRITTEN])
+        consumers = {}
+        for i, c in enumerate(self._consumers):
+            if not c[_ACTIVE] and not c[_DONE]:
+                continue
+            consumers[i] = {
+                "done": int(c[_DONE]),
+                "overruns": int(c[_OVERRUNS]),
+                "torn": int(c[_TORN]),
+                "lag": max(0, written - int(c[_CURSOR])),
+            }
+        return {
+            "written": written,
+            "producer_waits": int(self._ctrl[_WAITS]),
+            "producer_wait_s": self._ctrl[_WAIT_NS] / 1e9,
+            "consumers": consumers,
+        }
+
+
+def consume_doa(name, consumer_id, stride, Fs, f, d, bw=2000, n_bins=5, results=None):
+    """
+    Consumer loop: band-pass and phase-estimate every block this consumer
+    owns, straight from the shared slots, until the stream closes.
+    Appends (sample_index, theta_deg) to results if given.
+    """
+    ring = ShmRing.attach(name)
+    ring.connect(consumer_id, stride)
+    try:
+        while True:
+            item = ring.get(consumer_id)
+            if item is None:
+                break
+            k, x, sample_index, _ = item
+            xf = bandpass_filter(x, Fs, f, bw)
+            delta_t = estimate_tdoa_phase(xf[0], xf[1], Fs, f, n_bins)
+            if ring.release(consumer_id, k) and results is not None:
+                results.append((sample_index, tdoa_to_doa(delta_t, d)))
+        ring.disconnect(consumer_id)
+    finally:
+        ring.close()
+
+
+def _demo(args):
+    from signal_model import generate_signals, generate_time_axis
+
+    t = generate_time_axis(args.Fs, args.block / args.Fs)
+    ring = ShmRing.create(2, args.block, n_slots=args.slots)
+    try:
+        workers = [
+            Process(target=consume_doa,
+                    args=(ring.name, i, args.consumers, args.Fs, args.f, args.d))
+            for i in range(args.consumers)
+        ]
+        for w in workers:
+            w.start()
+        # Let every consumer connect before the first block.
+        while ring.n_connected() < args.consumers:
+            time.sleep(1e-3)
+
+        rng = np.random.default_rng(args.seed)
+        x1, x2, _ = generate_signals(t, args.f, 30.0, args.d, 0.01, rng=rng)
+        block = np.stack([x1, x2])
+
+        t0 = time.perf_counter()
+        for k in range(args.blocks):
+            ring.write(block, sample_index=k * args.block, wait=not args.no_backpressure)
+        ring.close_stream()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - t0
+
+        stats = ring.stats()
+        print(f"{stats['written']} blocks of {args.block} samples in {elapsed:.2f} s "
+              f"({stats['written'] * args.block / elapsed / 1e6:.2f} Msamples/s per channel)")
+        print(f"producer waited {stats['producer_waits']} times, "
+              f"{stats['producer_wait_s']:.2f} s total")
+        for i, c in stats["consumers"].items():
+            print(f"consumer {i}: done {c['done']}, overruns {c['overruns']}, torn {c['torn']}")
+    finally:
+        ring.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared-memory ring throughput demo")
+    parser.add_argument("--consumers", type=int, default=2)
+    parser.add_argument("--blocks", type=int, default=500)
+    parser.add_argument("--block", type=int, default=20_000, help="samples per block")
+    parser.add_argument("--slots", type=int, default=16)
+    parser.add_argument("--Fs", type=float, default=100_000)
+    parser.add_argument("--f", type=float, default=30_000)
+    parser.add_argument("--d", type=float, default=0.02)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--no-backpressure", action="store_true",
+                        help="overwrite slots instead of waiting for consumers")
+    _demo(parser.parse_args())
@@ -3,22 +3,133 @@ import numpy as np
 C = 1500 # speed of sound (m/s)
 
 
-def generate_time_axis(Fs, T):
-    return np.arange(0, T, 1 / Fs)
+# Samples per synthesis chunk (all rows together); bounds temporaries.
+_CHUNK_ELEMENTS = 1 << 20
 
 
-def generate_signals(t, f, theta_deg, d, noise_sigma):
+def generate_time_axis(Fs, T, dtype=np.float64):
     """
-    Generate two sensor signals with DOA-based delay and noise
+    Sample times of a capture of duration T.
+
+    A float32 axis halves memory but only resolves times to about
+    T * 6e-8 s, i.e. a carrier phase error of ~2*pi*f*T*6e-8 rad; keep t
+    in float64 for long captures and pass dtype to the generators instead.
+    """
+    if np.dtype(dtype) == np.float64:
+        return np.arange(0, T, 1 / Fs)
+    N = int(np.ceil(T / (1 / Fs)))
+    return np.arange(N, dtype=dtype) / np.asarray(Fs, dtype=dtype)
+
+
+def ula_positions(M, d):
+    """
+    Element positions (m) of an M-sensor uniform linear array with spacing d,
+    sensor 1 at the origin.
+    """
+    return np.arange(M) * d
+
+
+def steering_delays(positions, theta_deg):
+    """
+    Far-field arrival delay (s) of each element relative to the origin.
+    """
+    return np.asarray(positions, dtype=float) * np.sin(np.deg2rad(theta_deg)) / C
+
+
+def make_rng(seed=None):
+    """
+    np.random.Generator from a seed, SeedSequence or existing Generator
+    (returned as is). None gives fresh OS entropy.
+    """
+    return np.random.default_rng(seed)
+
+
+def spawn_rngs(seed, n):
+    """
+    n statistically independent Generators derived from one seed via
+    SeedSequence.spawn, for batched or parallel trials.
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed.spawn(n)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(s) for s in seed.spawn(n)]
+
+
+def generate_multi_source_signals(t, sources, positions, noise_sigma, n_trials=None,
+                                  dtype=None, rng=None):
     """
-    theta = np.deg2rad(theta_deg)
-    tau = (d * np.sin(theta)) / C
+    Generate M sensor signals carrying several simultaneous far-field tones.
+
+    sources is a sequence of (f, theta_deg) or (f, theta_deg, amplitude)
+    tuples, one per emitter. Returns (X, taus): X as in
+    generate_array_signals, taus of shape (n_sources, M).
 
-    x1 = np.sin(2 * np.pi * f * t)
-    x2 = np.sin(2 * np.pi * f * (t - tau))
+    Noise for every channel and trial is drawn from rng (seed or Generator,
+    see make_rng) in one call straight into X; the tones are then added in
+    float64 chunks, so no full-size temporaries are made.
+    """
+    sources = [tuple(s) + (1.0,) * (3 - len(s)) for s in sources]
+    taus = np.array([steering_delays(positions, theta) for _, theta, _ in sources])
+    M = taus.shape[1]
+    N = len(t)
+    dtype = t.dtype if dtype is None else np.dtype(dtype)
+
+    lead = (M,) if n_trials is None else (n_trials, M)
+    X = np.empty(lead + (N,), dtype=dtype)
 
     # Add noise
-    x1 += np.random.normal(0, noise_sigma, size=len(t))
-    x2 += np.random.normal(0, noise_sigma, size=len(t))
+    make_rng(rng).standard_normal(out=X, dtype=dtype)
+    X *= noise_sigma
+
+    step = max(1, _CHUNK_ELEMENTS // M)
+    for start in range(0, N, step):
+        stop = min(start + step, N)
+        tc = np.asarray(t[start:stop], dtype=np.float64)
+        for (f, _, amplitude), tau in zip(sources, taus):
+            tone = np.sin(2 * np.pi * f * (tc[None, :] - tau[:, None]))
+            if amplitude != 1.0:
+                tone *= amplitude
+            X[..., start:stop] += tone
+
+    return X, taus
+
+
+def generate_array_signals(t, f, theta_deg, positions, noise_sigma, n_trials=None,
+                           dtype=None, rng=None):
+    """
+    Generate M sensor signals for elements at the given positions.
+
+    The tones for all elements come from one broadcast (M, len(t)) delay
+    matrix. Returns (X, taus): X is (M, len(t)), or (n_trials, M, len(t))
+    when n_trials is given; taus are the per-element delays.
 
-    return x1, x2, tau
+    X has the given dtype (float32 or float64, default: that of t). Noise
+    and tones are generated as in generate_multi_source_signals.
+    """
+    X, taus = generate_multi_source_signals(
+        t, [(f, theta_deg)], positions, noise_sigma, n_trials, dtype, rng
+    )
+    return X, taus[0]
+
+
+def generate_signals(t, f, theta_deg, d, noise_sigma, dtype=None, rng=None):
+    """
+    Generate two sensor signals with DOA-based delay and noise
+    """
+    X, taus = generate_array_signals(
+        t, f, theta_deg, [0.0, d], noise_sigma, dtype=dtype, rng=rng
+    )
+    return X[0], X[1], taus[1]
+
+
+def generate_signals_batch(t, f, theta_deg, d, noise_sigma, n_trials, dtype=None,
+                           rng=None):
+    """
+    Generate n_trials noisy realizations of the two sensor signals
+    as (n_trials, len(t)) blocks. The clean tones are shared across trials.
+    """
+    X, taus = generate_array_signals(
+        t, f, theta_deg, [0.0, d], noise_sigma, n_trials=n_trials, dtype=dtype, rng=rng
+    )
+    return X[:, 0], X[:, 1], taus[1]
@@ -0,0 +1,110 @@
+import numpy as np
+
+from doa_algorithm import CausalBandpass, carrier_bins, partial_dft, tdoa_to_doa
+
+
+class StreamingTDOAEstimator:
+    """
+    Frame-by-frame phase TDOA / DOA estimator for two-sensor streams.
+
+    Samples arrive in blocks of any size via push(). The carrier-bin
+    phasors of the latest frame_len samples are kept up to date with a
+    sliding DFT, and one estimate is emitted every hop samples once the
+    first frame is complete. Memory is O(frame_len) regardless of how
+    much data is pushed.
+
+    With prefilter=True, blocks first go through a causal stateful
+    band-pass (CausalBandpass) of width bw around f. The filter delays
+    both channels equally, so the cross-phase is unaffected.
+    """
+
+    def __init__(self, Fs, f, d, frame_len=4096, hop=1024, n_bins=5,
+                 prefilter=False, bw=2000):
+        if not 0 < hop <= frame_len:
+            raise ValueError("hop must be in (0, frame_len]")
+
+        self.Fs = Fs
+        self.f = f
+        self.d = d
+        self.frame_len = frame_len
+        self.hop = hop
+
+        self.prefilter = CausalBandpass(Fs, f, bw) if prefilter else None
+
+        self.k_start, self.k_end, self.f_bin = carrier_bins(frame_len, Fs, f, n_bins)
+
+        # G[j, k] = exp(2j*pi*k*(hop - j)/N): rotation applied to a sample
+        # entering the frame j samples into a hop-long update.
+        k = np.arange(self.k_start, self.k_end, dtype=np.int64)[None, :]
+        j = np.arange(hop + 1, dtype=np.int64)[:, None]
+        self._G = np.exp(2j * np.pi * ((k * (hop - j)) % frame_len) / frame_len)
+
+        self.reset()
+
+    def reset(self):
+        self._buf = np.zeros((2, self.frame_len))
+        self._pos = 0
+        self._S = np.zeros((2, self.k_end - self.k_start), dtype=complex)
+        self.n_seen = 0
+        if self.prefilter is not None:
+            self.prefilter.reset()
+        self._since_hop = 0
+        self._since_resync = 0
+
+    def push(self, block):
+        """
+        Feed a (2, n) block of sensor samples.
+        Returns a list of (sample_index, delta_t, theta_deg) estimates,
+        one per completed hop; sample_index is the end of the frame.
+        """
+        block = np.asarray(block, dtype=float)
+        if block.ndim != 2 or block.shape[0] != 2:
+            raise ValueError("block must have shape (2, n)")
+        if self.prefilter is not None:
+            block = self.prefilter.process(block)
+
+        estimates = []
+        i = 0
+        n = block.shape[1]
+        while i < n:
+            L = min(self.hop - self._since_hop, n - i)
+            self._update(block[:, i:i + L])
+            i += L
+
+            self._since_hop += L
+            if self._since_hop == self.hop:
+                self._since_hop = 0
+                if self.n_seen >= self.frame_len:
+                    estimates.append(self._estimate())
+
+        return estimates
+
+    def _update(self, x):
+        N = self.frame_len
+        L = x.shape[1]
+        idx = (self._pos + np.arange(L)) % N
+
+        diff = x - self._buf[:, idx]
+        G = self._G[self.hop - L:]
+        self._S = G[0] * self._S + diff @ G[:L]
+
+        self._buf[:, idx] = x
+        self._pos = (self._pos + L) % N
+        self.n_seen += L
+        self._since_resync += L
+
+    def _resync(self):
+        # Recompute the bins exactly from the frame to cancel the slow
+        # round-off drift of the recursive update.
+        frame = np.roll(self._buf, -self._pos, axis=1)
+        self._S = partial_dft(frame, self.k_start, self.k_end)
+        self._since_resync = 0
+
+    def _estimate(self):
+        if self._since_resync >= self.frame_len * 16:
+            self._resync()
+
+        mean_phasor = np.mean(self._S[0] * np.conj(self._S[1]))
+        delta_t = np.angle(mean_phasor) / (2 * np.pi * self.f_bin)
+
+        return self.n_seen, delta_t, tdoa_to_doa(delta_t, self.d)